@@ -0,0 +1,84 @@
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.signals import user_logged_out
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+USER_CACHE_KEY = 'auth_user:{}'
+USER_CACHE_TIMEOUT = 5 * 60
+
+
+def invalidate_user(user_id):
+    cache.delete(USER_CACHE_KEY.format(user_id))
+
+
+def cached_fields(model):
+    """Поля пользователя в кэше: всё, кроме хэша пароля"""
+    return [
+        field.attname for field in model._meta.concrete_fields
+        if field.attname != 'password'
+    ]
+
+
+def get_cached_user(request):
+    """Пользователь сессии из кэша, при промахе - обычная загрузка из БД.
+
+    В кэше лежат поля пользователя без пароля и хэш для сессии.
+    Закэшированный пользователь подходит, только если этот хэш совпадает
+    с хэшем в сессии, как и в django.contrib.auth.get_user. Кэш должен
+    быть общим для всех воркеров, иначе сброс после смены пароля виден
+    только в одном из них (см. settings/prod.py).
+    """
+    session = request.session
+    user_id = session.get(auth.SESSION_KEY)
+    backend_path = session.get(auth.BACKEND_SESSION_KEY)
+    if user_id is None or backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return auth.get_user(request)
+    key = USER_CACHE_KEY.format(user_id)
+    model = auth.get_user_model()
+    cached = cache.get(key)
+    if cached is not None:
+        auth_hash, values = cached
+        if constant_time_compare(
+            session.get(auth.HASH_SESSION_KEY, ''), auth_hash
+        ):
+            # пароль остаётся отложенным полем и загрузится по обращению
+            user = model.from_db('default', cached_fields(model), values)
+            user.backend = backend_path
+            return user
+    user = auth.get_user(request)
+    if user.is_authenticated:
+        cache.set(
+            key,
+            (
+                user.get_session_auth_hash(),
+                [getattr(user, name) for name in cached_fields(model)],
+            ),
+            USER_CACHE_TIMEOUT,
+        )
+    return user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """request.user из кэша вместо запроса к БД на каждой странице."""
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_cached_user(request))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def reload_user(sender, instance, **kwargs):
+    """Смена пароля, имени или активности видна со следующего запроса"""
+    invalidate_user(instance.pk)
+
+
+@receiver(user_logged_out)
+def forget_user(sender, request, user, **kwargs):
+    if user is not None:
+        invalidate_user(user.pk)
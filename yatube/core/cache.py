@@ -0,0 +1,72 @@
+import hashlib
+import re
+import uuid
+from functools import wraps
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+
+HOLE_MARKER = '<!--hole:{}-->'
+HOLE_RE = re.compile(r'<!--hole:(\d+)-->')
+VERSION_KEY = 'version:{}'
+
+
+def get_version(name):
+    return cache.get_or_set(VERSION_KEY.format(name), new_version, None)
+
+
+def new_version():
+    # случайное значение, а не счётчик: после очистки кэша версия
+    # не совпадёт ни с одной из уже виденных воркерами
+    return uuid.uuid4().hex[:12]
+
+
+def bump_version(name):
+    """Делает недействительными все ключи, построенные на этой версии."""
+    cache.set(VERSION_KEY.format(name), new_version(), None)
+
+
+def fill_holes(request, body, holes):
+    """Дорисовывает персональные фрагменты в общую страницу."""
+    def render_hole(match):
+        template_name, context = holes[int(match.group(1))]
+        return render_to_string(template_name, context, request=request)
+    return HOLE_RE.sub(render_hole, body)
+
+
+def shared_cache_page(timeout, key_prefix, version_name):
+    """Кэш страницы, общий для гостей и авторизованных пользователей.
+
+    Страница кэшируется один раз, фрагменты {% hole %} (шапка,
+    переключатель ленты и т.п.) рендерятся для каждого запроса заново.
+    Ключ зависит от версии version_name, см. bump_version.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            key = '{}:{}:{}'.format(
+                key_prefix,
+                get_version(version_name),
+                hashlib.md5(request.get_full_path().encode()).hexdigest(),
+            )
+            cached = cache.get(key)
+            if cached is not None:
+                return HttpResponse(fill_holes(request, *cached))
+            request.page_holes = []
+            try:
+                response = view(request, *args, **kwargs)
+            finally:
+                holes = request.page_holes
+                del request.page_holes
+            if response.streaming:
+                return response
+            body = response.content.decode(response.charset)
+            if response.status_code == 200:
+                cache.set(key, (body, holes), timeout)
+            response.content = fill_holes(request, body, holes)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,92 @@
+import os
+import re
+
+from django.conf import settings
+from django.template.utils import get_app_template_dirs
+
+COMMENT_RE = re.compile(r'/\*.*?\*/', re.S)
+CLASS_ATTR_RE = re.compile(r'class\s*=\s*"([^"]*)"')
+ADDCLASS_RE = re.compile(r'addclass:"([^"]*)"')
+TEMPLATE_TAG_RE = re.compile(r'{%.*?%}|{{.*?}}', re.S)
+CLASS_SELECTOR_RE = re.compile(r'\.(-?[_a-zA-Z][_a-zA-Z0-9-]*)')
+NESTED_AT_RULES = ('@media', '@supports')
+
+
+def template_dirs():
+    dirs = []
+    for backend in settings.TEMPLATES:
+        dirs.extend(backend.get('DIRS', []))
+    dirs.extend(get_app_template_dirs('templates'))
+    return dirs
+
+
+def used_classes(dirs=None):
+    """CSS-классы, которые встречаются в шаблонах проекта."""
+    classes = set(getattr(settings, 'STATIC_PURGE_SAFELIST', ()))
+    for directory in dirs or template_dirs():
+        for root, _, files in os.walk(directory):
+            for name in files:
+                if not name.endswith('.html'):
+                    continue
+                with open(os.path.join(root, name), encoding='utf-8') as f:
+                    source = f.read()
+                for value in CLASS_ATTR_RE.findall(source):
+                    # {% if %}active{% endif %} -> active
+                    classes.update(TEMPLATE_TAG_RE.sub(' ', value).split())
+                for value in ADDCLASS_RE.findall(source):
+                    classes.update(value.split())
+    return classes
+
+
+def selector_used(prelude, classes):
+    """Правило нужно, если хотя бы один его селектор применим к шаблонам.
+
+    Селекторы без классов (body, :root, a) оставляем всегда.
+    """
+    for selector in prelude.split(','):
+        if all(
+            name in classes for name in CLASS_SELECTOR_RE.findall(selector)
+        ):
+            return True
+    return False
+
+
+def closing_brace(css, start):
+    depth = 0
+    for index in range(start, len(css)):
+        if css[index] == '{':
+            depth += 1
+        elif css[index] == '}':
+            depth -= 1
+            if not depth:
+                return index
+    return len(css) - 1
+
+
+def purge_css(css, classes):
+    """Удаляет из таблицы стилей правила для неиспользуемых классов."""
+    css = COMMENT_RE.sub('', css)
+    result = []
+    position = 0
+    while position < len(css):
+        brace = css.find('{', position)
+        if brace == -1:
+            result.append(css[position:].strip())
+            break
+        semicolon = css.find(';', position, brace)
+        if semicolon != -1:
+            # @charset, @import и прочие правила без блока
+            result.append(css[position:semicolon + 1].strip())
+            position = semicolon + 1
+            continue
+        end = closing_brace(css, brace)
+        prelude = css[position:brace].strip()
+        body = css[brace + 1:end]
+        if prelude.startswith(NESTED_AT_RULES):
+            inner = purge_css(body, classes)
+            if inner:
+                result.append(f'{prelude}{{{inner}}}')
+        elif prelude.startswith('@') or selector_used(prelude, classes):
+            result.append(f'{prelude}{{{body}}}')
+        position = end + 1
+    return ''.join(result)
@@ -0,0 +1,62 @@
+import io
+import posixpath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+SAVE_FORMATS = {'JPEG', 'PNG', 'GIF', 'WEBP'}
+
+
+def downscale(path, max_size, max_pixels):
+    """Уменьшает картинку и убирает EXIF.
+
+    Возвращает новые байты или None, если картинка уже подходит.
+    """
+    Image.MAX_IMAGE_PIXELS = max_pixels
+    with Image.open(path) as image:
+        image_format = image.format
+        if image_format not in SAVE_FORMATS:
+            return None
+        too_big = image.width > max_size[0] or image.height > max_size[1]
+        if not too_big and not image.info.get('exif'):
+            return None
+        # для JPEG декодируем сразу в уменьшенном масштабе - меньше памяти
+        image.draft('RGB', max_size)
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(max_size)
+        output = io.BytesIO()
+        image.save(output, format=image_format)
+    return output.getvalue()
+
+
+def optimize_image(model, pk, field_name, name):
+    """Уменьшает картинку из поля модели, выполняется фоновой задачей.
+
+    Результат сохраняется, только если поле всё ещё ссылается на name.
+    """
+    if not name:
+        return
+    try:
+        path = default_storage.path(name)
+    except NotImplementedError:
+        return
+    content = downscale(
+        path, settings.IMAGE_MAX_SIZE, settings.IMAGE_MAX_PIXELS
+    )
+    if content is None:
+        return
+    instance = model._default_manager.filter(
+        pk=pk, **{field_name: name}
+    ).first()
+    if instance is None:
+        return
+    field = model._meta.get_field(field_name)
+    new_name = default_storage.save(
+        field.generate_filename(instance, posixpath.basename(name)),
+        ContentFile(content),
+    )
+    setattr(instance, field_name, new_name)
+    # старый файл освобождают сигналы модели
+    instance.save(update_fields=[field_name])
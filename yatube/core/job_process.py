@@ -0,0 +1,17 @@
+"""Точки входа дочерних процессов пула задач.
+
+Новый процесс импортирует этот модуль до django.setup(), поэтому модели
+и core.jobs подключаются только внутри функций.
+"""
+import django
+
+
+def init_process():
+    django.setup()
+    from .jobs import autodiscover
+    autodiscover()
+
+
+def run_task(name, payload):
+    from .jobs import run_task
+    run_task(name, payload)
@@ -0,0 +1,354 @@
+"""Фоновая очередь задач в БД.
+
+Задача - функция, зарегистрированная декоратором task. task.enqueue(...)
+после коммита текущей транзакции кладёт в очередь строку Job, а
+manage.py run_workers забирает задачи по приоритету и выполняет их в пуле
+потоков или процессов. Упавшая задача повторяется с растущей паузой,
+пока не кончатся попытки.
+"""
+import inspect
+import json
+import multiprocessing
+import time
+import traceback
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from . import job_process
+from .models import Job
+
+BACKOFF_BASE = 10
+BACKOFF_MAX = 60 * 60
+PRUNE_INTERVAL = 60 * 60
+# как часто воркер отмечает, что его задачи ещё выполняются;
+# должно быть заметно меньше JOB_TIMEOUT
+HEARTBEAT_INTERVAL = 60
+# аннотации, которые проверяются при постановке в очередь
+SIMPLE_TYPES = (int, float, str, bool, list, dict)
+SIMPLE_KINDS = (
+    inspect.Parameter.POSITIONAL_OR_KEYWORD,
+    inspect.Parameter.KEYWORD_ONLY,
+)
+
+_registry = {}
+
+
+class Task:
+    """Зарегистрированная задача: вызывается как обычная функция"""
+
+    def __init__(self, func, name, queue, priority, max_attempts):
+        self.func = func
+        self.name = name
+        self.queue = queue
+        self.priority = priority
+        self.max_attempts = max_attempts
+        self.signature = inspect.signature(func)
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def validate(self, args, kwargs):
+        """Сверяет аргументы с сигнатурой и аннотациями задачи"""
+        bound = self.signature.bind(*args, **kwargs)
+        for name, value in bound.arguments.items():
+            parameter = self.signature.parameters[name]
+            if parameter.kind not in SIMPLE_KINDS:
+                continue
+            annotation = parameter.annotation
+            if annotation in SIMPLE_TYPES and not isinstance(
+                value, annotation
+            ):
+                raise TypeError(
+                    f'{self.name}: {name} должен быть '
+                    f'{annotation.__name__}, а не {type(value).__name__}'
+                )
+
+    def enqueue(self, *args, **kwargs):
+        enqueue(self, args, kwargs)
+
+
+def task(func=None, *, queue='default', priority=0, max_attempts=3,
+         name=None):
+    """Регистрирует функцию как фоновую задачу.
+
+    Аргументы задачи хранятся в JSON, аннотации простых типов
+    проверяются при постановке в очередь.
+    """
+    def register(func):
+        registered = Task(
+            func,
+            name or f'{func.__module__}.{func.__qualname__}',
+            queue,
+            priority,
+            max_attempts,
+        )
+        _registry[registered.name] = registered
+        return registered
+    return register if func is None else register(func)
+
+
+def autodiscover():
+    """Импортирует модули tasks всех приложений"""
+    autodiscover_modules('tasks')
+
+
+def get_task(name):
+    if name not in _registry:
+        autodiscover()
+    return _registry[name]
+
+
+def enqueue(task, args=(), kwargs=None, priority=None, delay=0):
+    """Ставит задачу в очередь после коммита текущей транзакции"""
+    kwargs = kwargs or {}
+    task.validate(args, kwargs)
+    payload = json.dumps({'args': list(args), 'kwargs': kwargs})
+
+    def create():
+        Job.objects.create(
+            queue=task.queue,
+            task=task.name,
+            payload=payload,
+            priority=task.priority if priority is None else priority,
+            max_attempts=task.max_attempts,
+            run_at=timezone.now() + timezone.timedelta(seconds=delay),
+        )
+    transaction.on_commit(create)
+
+
+def backoff(attempts):
+    """Пауза перед повтором: 10 с, 20 с, 40 с... но не больше часа"""
+    return min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+
+
+def run_task(name, payload):
+    """Выполняет задачу в потоке или дочернем процессе пула"""
+    close_old_connections()
+    try:
+        data = json.loads(payload)
+        get_task(name)(*data['args'], **data['kwargs'])
+    finally:
+        close_old_connections()
+
+
+def prune_jobs():
+    """Удаляет завершённые задачи старше JOB_RETENTION_DAYS"""
+    return Job.objects.filter(
+        status__in=(Job.DONE, Job.FAILED),
+        run_at__lt=timezone.now() - timezone.timedelta(
+            days=settings.JOB_RETENTION_DAYS
+        ),
+    ).delete()[0]
+
+
+class InlineExecutor:
+    """Выполняет задачи сразу в потоке воркера, для тестов и отладки"""
+
+    def submit(self, func, *args):
+        future = Future()
+        try:
+            future.set_result(func(*args))
+        except Exception as error:
+            future.set_exception(error)
+        return future
+
+    def shutdown(self, wait=True):
+        pass
+
+
+class Worker:
+    """Забирает задачи из очередей и раздаёт их пулам.
+
+    Все обращения к таблице задач идут из потока воркера, пулы только
+    выполняют функции задач.
+    """
+
+    def __init__(self, queues=None):
+        config = settings.JOB_QUEUES
+        self.queues = {name: config[name] for name in queues or config}
+        self.pools = {}
+        self.running = {}
+        self.pruned_at = None
+        self.heartbeat_at = None
+
+    def pool(self, queue):
+        if queue not in self.pools:
+            config = self.queues[queue]
+            if config['pool'] == 'process':
+                # spawn: дочерние процессы не наследуют соединения с БД
+                self.pools[queue] = ProcessPoolExecutor(
+                    max_workers=config['concurrency'],
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=job_process.init_process,
+                )
+            elif config['pool'] == 'thread':
+                self.pools[queue] = ThreadPoolExecutor(
+                    max_workers=config['concurrency'],
+                    thread_name_prefix=f'jobs-{queue}',
+                )
+            else:
+                self.pools[queue] = InlineExecutor()
+        return self.pools[queue]
+
+    def requeue_stale(self):
+        """Возвращает в очередь задачи упавших воркеров.
+
+        Брошенный запуск считается попыткой: задача, которая роняет
+        воркер, после max_attempts помечается FAILED, а не крутится
+        вечно.
+        """
+        now = timezone.now()
+        stale = Job.objects.filter(
+            status=Job.RUNNING,
+            started_at__lt=now - timezone.timedelta(
+                seconds=settings.JOB_TIMEOUT
+            ),
+        )
+        error = f'Не завершилась за {settings.JOB_TIMEOUT} с'
+        stale.filter(attempts__gte=F('max_attempts')).update(
+            status=Job.FAILED, last_error=error
+        )
+        for job in stale.only('pk', 'attempts'):
+            Job.objects.filter(pk=job.pk, status=Job.RUNNING).update(
+                status=Job.QUEUED,
+                last_error=error,
+                run_at=now + timezone.timedelta(
+                    seconds=backoff(job.attempts)
+                ),
+            )
+
+    def heartbeat(self):
+        """Раз в HEARTBEAT_INTERVAL продлевает started_at своих задач.
+
+        Долгая задача живого воркера не считается брошенной. Условие на
+        started_at: задачу, которую уже вернули в очередь и забрал другой
+        воркер, не трогаем.
+        """
+        now = time.monotonic()
+        if self.heartbeat_at is not None and (
+            now - self.heartbeat_at < HEARTBEAT_INTERVAL
+        ):
+            return
+        self.heartbeat_at = now
+        started_at = timezone.now()
+        for job in self.running.values():
+            if Job.objects.filter(
+                pk=job.pk, status=Job.RUNNING, started_at=job.started_at
+            ).update(started_at=started_at):
+                job.started_at = started_at
+
+    def prune(self):
+        """Раз в PRUNE_INTERVAL удаляет старые выполненные и упавшие задачи"""
+        now = time.monotonic()
+        if self.pruned_at is not None and (
+            now - self.pruned_at < PRUNE_INTERVAL
+        ):
+            return
+        self.pruned_at = now
+        prune_jobs()
+
+    def free_slots(self, queue):
+        """Лимит очереди общий для всех воркеров"""
+        running = Job.objects.filter(queue=queue, status=Job.RUNNING).count()
+        return self.queues[queue]['concurrency'] - running
+
+    def claim(self, queue, limit):
+        """Забирает до limit готовых задач очереди по приоритету"""
+        now = timezone.now()
+        candidates = Job.objects.filter(
+            queue=queue, status=Job.QUEUED, run_at__lte=now
+        ).order_by('-priority', 'run_at').values_list('pk', flat=True)
+        claimed = [
+            pk for pk in candidates[:limit]
+            # условие на статус: задачу заберёт только один воркер
+            if Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+                status=Job.RUNNING,
+                started_at=now,
+                attempts=F('attempts') + 1,
+            )
+        ]
+        return Job.objects.filter(pk__in=claimed).order_by(
+            '-priority', 'run_at'
+        )
+
+    def dispatch(self):
+        """Запускает готовые задачи на свободные места, возвращает их число"""
+        started = 0
+        for queue in self.queues:
+            free = self.free_slots(queue)
+            if free <= 0:
+                continue
+            process = self.queues[queue]['pool'] == 'process'
+            for job in self.claim(queue, free):
+                future = self.pool(queue).submit(
+                    job_process.run_task if process else run_task,
+                    job.task,
+                    job.payload,
+                )
+                self.running[future] = job
+                started += 1
+        return started
+
+    def collect(self, timeout=0):
+        """Записывает результаты завершившихся задач"""
+        if not self.running:
+            return
+        done, _ = wait(
+            self.running, timeout=timeout, return_when=FIRST_COMPLETED
+        )
+        for future in done:
+            job = self.running.pop(future)
+            error = future.exception()
+            if error is None:
+                job.status = Job.DONE
+            else:
+                job.last_error = ''.join(traceback.format_exception(
+                    type(error), error, error.__traceback__
+                ))
+                if job.attempts < job.max_attempts:
+                    job.status = Job.QUEUED
+                    job.run_at = timezone.now() + timezone.timedelta(
+                        seconds=backoff(job.attempts)
+                    )
+                else:
+                    job.status = Job.FAILED
+            # задачу могли счесть брошенной и отдать другому воркеру,
+            # тогда её строка уже не наша
+            Job.objects.filter(
+                pk=job.pk, status=Job.RUNNING, started_at=job.started_at
+            ).update(
+                status=job.status, run_at=job.run_at, last_error=job.last_error
+            )
+
+    def run(self, once=False, poll_interval=1):
+        """Основной цикл; с once - выход, когда готовых задач не осталось"""
+        try:
+            while True:
+                self.heartbeat()
+                self.requeue_stale()
+                self.prune()
+                started = self.dispatch()
+                if once and not started and not self.running:
+                    return
+                if started:
+                    self.collect()
+                elif self.running:
+                    self.collect(poll_interval)
+                else:
+                    time.sleep(poll_interval)
+        finally:
+            for pool in self.pools.values():
+                pool.shutdown()
+            while self.running:
+                self.collect(None)
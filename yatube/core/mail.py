@@ -0,0 +1,205 @@
+"""Исходящая почта через таблицу OutgoingEmail.
+
+OutboxEmailBackend вместо отправки записывает письма в таблицу в той же
+транзакции, что и запрос, и ставит в очередь задачу доставки.
+deliver_batch отправляет пачку писем через настоящий бэкенд
+(settings.OUTBOX_EMAIL_BACKEND) одним соединением, неудачные письма
+повторяются с растущей паузой.
+"""
+import json
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.utils import timezone
+
+from .jobs import backoff
+from .models import OutgoingEmail
+
+RECIPIENT_FIELDS = ('to', 'cc', 'bcc', 'reply_to')
+SAVED_FIELDS = (
+    'status', 'attempts', 'send_after', 'sent_at', 'last_error',
+    'body', 'html_body',
+)
+
+
+class OutboxEmailBackend(BaseEmailBackend):
+    """Кладёт письма в исходящую очередь"""
+
+    def send_messages(self, email_messages):
+        from .tasks import deliver_outbox
+
+        now = timezone.now()
+        emails = OutgoingEmail.objects.bulk_create(
+            OutgoingEmail(
+                subject=message.subject,
+                body=message.body,
+                html_body=next(
+                    (
+                        content
+                        for content, mimetype in getattr(
+                            message, 'alternatives', []
+                        )
+                        if mimetype == 'text/html'
+                    ),
+                    '',
+                ),
+                from_email=message.from_email,
+                recipients=json.dumps({
+                    field: list(getattr(message, field))
+                    for field in RECIPIENT_FIELDS
+                }),
+                headers=json.dumps(message.extra_headers),
+                send_after=now,
+            )
+            for message in email_messages
+            if message.recipients()
+        )
+        if emails:
+            deliver_outbox.enqueue()
+        return len(emails)
+
+
+def to_message(email, connection):
+    recipients = json.loads(email.recipients)
+    message = EmailMultiAlternatives(
+        email.subject,
+        email.body,
+        email.from_email,
+        connection=connection,
+        headers=json.loads(email.headers),
+        **recipients,
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+
+def requeue_stale():
+    """Возвращает в очередь письма, отправку которых прервали.
+
+    Прерванная отправка считается попыткой, как и у задач: письмо,
+    на котором падает воркер, после OUTBOX_MAX_ATTEMPTS становится FAILED.
+    """
+    stale = OutgoingEmail.objects.filter(
+        status=OutgoingEmail.SENDING,
+        claimed_at__lt=timezone.now() - timezone.timedelta(
+            seconds=settings.JOB_TIMEOUT
+        ),
+    ).only('pk', 'attempts')
+    error = f'Не отправлено за {settings.JOB_TIMEOUT} с'
+    for email in stale:
+        email.attempts += 1
+        _retry(email, error)
+        OutgoingEmail.objects.filter(
+            pk=email.pk, status=OutgoingEmail.SENDING
+        ).update(
+            status=email.status,
+            attempts=email.attempts,
+            send_after=email.send_after,
+            last_error=email.last_error,
+        )
+
+
+def claim(batch_size):
+    now = timezone.now()
+    candidates = OutgoingEmail.objects.filter(
+        status=OutgoingEmail.QUEUED, send_after__lte=now
+    ).order_by('send_after', 'pk').values_list('pk', flat=True)
+    claimed = [
+        pk for pk in candidates[:batch_size]
+        if OutgoingEmail.objects.filter(
+            pk=pk, status=OutgoingEmail.QUEUED
+        ).update(status=OutgoingEmail.SENDING, claimed_at=now)
+    ]
+    return list(OutgoingEmail.objects.filter(pk__in=claimed))
+
+
+def deliver_batch(batch_size=None):
+    """Отправляет пачку писем одним соединением, возвращает её размер"""
+    requeue_stale()
+    emails = claim(batch_size or settings.OUTBOX_BATCH_SIZE)
+    if not emails:
+        return 0
+    connection = get_connection(settings.OUTBOX_EMAIL_BACKEND)
+    try:
+        connection.open()
+    except Exception as error:
+        # сервер недоступен: попытка не удалась у всей пачки
+        for email in emails:
+            email.attempts += 1
+            _retry(email, describe(error))
+            email.save(update_fields=SAVED_FIELDS)
+        return len(emails)
+    try:
+        for email in emails:
+            _send(email, connection)
+    finally:
+        connection.close()
+    return len(emails)
+
+
+def describe(error):
+    return f'{type(error).__name__}: {error}'
+
+
+def _retry(email, error):
+    """Неудачная попытка: повтор с растущей паузой или FAILED"""
+    email.last_error = error
+    if email.attempts < settings.OUTBOX_MAX_ATTEMPTS:
+        email.status = OutgoingEmail.QUEUED
+        email.send_after = timezone.now() + timezone.timedelta(
+            seconds=backoff(email.attempts)
+        )
+    else:
+        email.status = OutgoingEmail.FAILED
+
+
+def _send(email, connection):
+    email.attempts += 1
+    try:
+        to_message(email, connection).send()
+    except Exception as error:
+        _retry(email, describe(error))
+    else:
+        email.status = OutgoingEmail.SENT
+        email.sent_at = timezone.now()
+        # в тексте бывают ссылки для сброса пароля, после отправки
+        # он больше не нужен
+        email.body = ''
+        email.html_body = ''
+    email.save(update_fields=SAVED_FIELDS)
+
+
+def prune_outbox():
+    """Удаляет отправленные и упавшие письма старше OUTBOX_RETENTION_DAYS"""
+    return OutgoingEmail.objects.filter(
+        status__in=(OutgoingEmail.SENT, OutgoingEmail.FAILED),
+        created__lt=timezone.now() - timezone.timedelta(
+            days=settings.OUTBOX_RETENTION_DAYS
+        ),
+    ).delete()[0]
+
+
+def next_attempt_delay():
+    """Через сколько секунд ждёт ближайшее письмо, или None.
+
+    Учитываются и отложенные письма, и застрявшие в отправке: их вернёт
+    в очередь requeue_stale через JOB_TIMEOUT после захвата.
+    """
+    times = [
+        OutgoingEmail.objects.filter(
+            status=OutgoingEmail.QUEUED
+        ).order_by('send_after').values_list('send_after', flat=True).first()
+    ]
+    claimed_at = OutgoingEmail.objects.filter(
+        status=OutgoingEmail.SENDING
+    ).order_by('claimed_at').values_list('claimed_at', flat=True).first()
+    if claimed_at is not None:
+        times.append(
+            claimed_at + timezone.timedelta(seconds=settings.JOB_TIMEOUT)
+        )
+    times = [moment for moment in times if moment is not None]
+    if not times:
+        return None
+    return max(0, (min(times) - timezone.now()).total_seconds())
@@ -0,0 +1,39 @@
+import time
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = 'Удаляет истёкшие сессии небольшими пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько сессий удалять за один запрос',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0,
+            help='Пауза между пачками в секундах',
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        total = 0
+        while True:
+            keys = list(
+                Session.objects.filter(expire_date__lt=now).values_list(
+                    'pk', flat=True
+                )[:options['batch_size']]
+            )
+            if not keys:
+                break
+            Session.objects.filter(pk__in=keys).delete()
+            total += len(keys)
+            time.sleep(options['pause'])
+        self.stdout.write(f'Удалено сессий: {total}')
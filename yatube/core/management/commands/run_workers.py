@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from core.jobs import Worker, autodiscover
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очередей settings.JOB_QUEUES'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--queue',
+            action='append',
+            dest='queues',
+            help='Обрабатывать только эту очередь (можно несколько раз)',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Выполнить готовые задачи и выйти',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1,
+            help='Пауза между опросами пустой очереди в секундах',
+        )
+
+    def handle(self, *args, **options):
+        autodiscover()
+        worker = Worker(options['queues'])
+        self.stdout.write(
+            'Очереди: {}'.format(', '.join(worker.queues))
+        )
+        worker.run(options['once'], options['poll_interval'])
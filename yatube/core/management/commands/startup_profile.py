@@ -0,0 +1,71 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# То же, что делает воркер при старте: setup приложений и загрузка URLconf
+SETUP_SNIPPET = (
+    'import django; django.setup(); '
+    'from django.urls import get_resolver; get_resolver().url_patterns'
+)
+
+
+def parse_importtime(output):
+    """Разбирает вывод `python -X importtime` в словарь модуль -> мкс."""
+    timings = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        try:
+            self_us, _, module = line[len('import time:'):].split('|')
+            timings[module.strip()] = int(self_us)
+        except ValueError:
+            # строка-заголовок таблицы
+            continue
+    return timings
+
+
+def app_import_time(timings, app):
+    """Суммарное время импорта пакета приложения и его модулей, мкс."""
+    return sum(
+        value for module, value in timings.items()
+        if module == app or module.startswith(app + '.')
+    )
+
+
+class Command(BaseCommand):
+    help = 'Показывает время импорта приложений при старте воркера'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--budget',
+            type=float,
+            default=None,
+            help='Допустимое суммарное время старта в миллисекундах',
+        )
+
+    def handle(self, *args, **options):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', SETUP_SNIPPET],
+            cwd=settings.BASE_DIR,
+            env=os.environ.copy(),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+        )
+        if result.returncode:
+            raise CommandError(result.stderr)
+        timings = parse_importtime(result.stderr)
+        for app in settings.STARTUP_PROFILE_APPS:
+            self.stdout.write(
+                f'{app}: {app_import_time(timings, app) / 1000:.1f} ms'
+            )
+        total = sum(timings.values()) / 1000
+        self.stdout.write(f'total: {total:.1f} ms')
+        budget = options['budget']
+        if budget is not None and total > budget:
+            raise CommandError(
+                f'Старт занял {total:.1f} ms при бюджете {budget:.1f} ms'
+            )
@@ -0,0 +1,95 @@
+from django.db import models
+
+
+class StoredFile(models.Model):
+    """Файл в хранилище с адресацией по содержимому и счётчиком ссылок"""
+    name = models.CharField(max_length=255, unique=True, verbose_name='name')
+    ref_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='ref_count',
+    )
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class Channel(models.Model):
+    """Версия канала уведомлений, общая для всех воркеров, см. core.pubsub"""
+    name = models.CharField(max_length=200, unique=True)
+    version = models.PositiveIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class Job(models.Model):
+    """Задача фоновой очереди, см. core.jobs"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+    queue = models.CharField(max_length=50, default='default')
+    task = models.CharField(max_length=200)
+    payload = models.TextField(default='{}')
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=QUEUED
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_at = models.DateTimeField()
+    started_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['queue', 'status', '-priority', 'run_at']),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.task} #{self.pk}'
+
+
+class OutgoingEmail(models.Model):
+    """Письмо в исходящей очереди, отправляется фоном, см. core.mail"""
+    QUEUED = 'queued'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'В очереди'),
+        (SENDING, 'Отправляется'),
+        (SENT, 'Отправлено'),
+        (FAILED, 'Ошибка'),
+    )
+    subject = models.TextField()
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=254)
+    # {"to": [...], "cc": [...], "bcc": [...], "reply_to": [...]}
+    recipients = models.TextField()
+    headers = models.TextField(default='{}')
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=QUEUED
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    send_after = models.DateTimeField()
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'send_after']),
+        ]
+
+    def __str__(self) -> str:
+        return self.subject
@@ -0,0 +1,95 @@
+"""Уведомления о новых данных в канале, например комментариях к посту.
+
+Версия канала хранится в таблице Channel, поэтому публикация в одном
+воркере видна подписчикам всех остальных. Подписчики одного процесса
+спят на общем условии: публикация из этого же процесса будит их сразу,
+а версию из БД раз в POLL_INTERVAL читает один из подписчиков канала
+за всех остальных, так что тысяча ожидающих - это всё равно один запрос.
+"""
+import threading
+import time
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import Channel
+
+POLL_INTERVAL = 2
+
+_lock = threading.Lock()
+_conditions = {}
+
+
+class _Channel:
+    def __init__(self):
+        self.condition = threading.Condition(_lock)
+        self.waiters = 0
+        self.version = None
+        # когда версию последний раз читали из БД; None - пора читать
+        self.checked_at = None
+
+
+def publish(channel):
+    """Сообщает подписчикам канала, что в нём появились данные."""
+    with transaction.atomic():
+        if not Channel.objects.filter(name=channel).update(
+            version=F('version') + 1
+        ):
+            try:
+                with transaction.atomic():
+                    Channel.objects.create(name=channel, version=1)
+            except IntegrityError:
+                Channel.objects.filter(name=channel).update(
+                    version=F('version') + 1
+                )
+    with _lock:
+        state = _conditions.get(channel)
+        if state is not None:
+            state.checked_at = None
+            state.condition.notify_all()
+
+
+def read_version(channel):
+    return Channel.objects.filter(name=channel).values_list(
+        'version', flat=True
+    ).first() or 0
+
+
+def _current(channel, state):
+    """Версия канала: из БД, если её давно не читали, иначе запомненная"""
+    with _lock:
+        now = time.monotonic()
+        if state.checked_at is not None and (
+            now - state.checked_at < POLL_INTERVAL
+        ):
+            return state.version
+        state.checked_at = now
+    version = read_version(channel)
+    with _lock:
+        state.version = version
+    return version
+
+
+def wait(channel, version, timeout):
+    """Ждёт, пока версия канала не станет отличной от version.
+
+    Возвращает текущую версию (может совпасть с version по таймауту).
+    Ожидающий поток спит на условии и не нагружает процессор.
+    """
+    deadline = time.monotonic() + timeout
+    with _lock:
+        state = _conditions.setdefault(channel, _Channel())
+        state.waiters += 1
+    try:
+        while True:
+            current = _current(channel, state)
+            remaining = deadline - time.monotonic()
+            if current != version or remaining <= 0:
+                return current
+            with _lock:
+                state.condition.wait(min(POLL_INTERVAL, remaining))
+    finally:
+        with _lock:
+            state.waiters -= 1
+            if not state.waiters:
+                del _conditions[channel]
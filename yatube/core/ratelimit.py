@@ -0,0 +1,126 @@
+import math
+import time
+from functools import partial, wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import render
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+# места под долгие ответы освобождаются сами, если воркер упал
+SLOT_TIMEOUT = 10 * 60
+
+
+def parse_rate(rate):
+    """'10/m' -> (10, 60)"""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period]
+
+
+def client_key(request):
+    """Пользователь, а для гостей - IP-адрес."""
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    return 'ip:{}'.format(request.META.get('REMOTE_ADDR', ''))
+
+
+def hit(group, ident, limit, period, now=None):
+    """Учитывает запрос в скользящем окне.
+
+    Окно приближается двумя счётчиками фиксированных окон: текущим и
+    долей предыдущего. Возвращает 0, если запрос разрешён, иначе
+    число секунд до следующей попытки.
+    """
+    now = time.time() if now is None else now
+    window = int(now // period)
+    key = f'rl:{group}:{ident}:{{}}'
+    current_key = key.format(window)
+    # add не перезаписывает существующий счётчик
+    cache.add(current_key, 0, period * 2)
+    current = cache.incr(current_key)
+    previous = cache.get(key.format(window - 1), 0)
+    elapsed = now - window * period
+    weighted = previous * (period - elapsed) / period + current
+    if weighted <= limit:
+        return 0
+    if current < limit:
+        # ждём, пока вклад предыдущего окна не опустится до лимита
+        wait = period - elapsed - (limit - current) * period / previous
+    else:
+        # ждём, пока текущее окно не станет предыдущим и не "остынет"
+        wait = period - elapsed + period * (1 - limit / current)
+    return max(1, math.ceil(wait))
+
+
+def ratelimit(group, rate, methods=('POST',), key=client_key):
+    """Ограничивает частоту запросов к вью.
+
+    Лимит можно переопределить в settings.RATELIMITS[group],
+    None там отключает ограничение.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            group_rate = getattr(settings, 'RATELIMITS', {}).get(group, rate)
+            if group_rate is None or (
+                methods and request.method not in methods
+            ):
+                return view(request, *args, **kwargs)
+            limit, period = parse_rate(group_rate)
+            retry_after = hit(group, key(request), limit, period)
+            if retry_after:
+                return too_many_requests(request, retry_after)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def too_many_requests(request, retry_after):
+    response = render(
+        request, 'core/429.html', {'retry_after': retry_after}, status=429
+    )
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def acquire_slot(request, group, limit, timeout=SLOT_TIMEOUT):
+    """Занимает одно из limit мест клиента под долгий ответ (поток,
+    long polling), чтобы несколько клиентов не заняли все воркеры.
+
+    Возвращает функцию, освобождающую место, или None, если мест нет.
+    """
+    key = 'slots:{}:{}'.format(group, client_key(request))
+    cache.add(key, 0, timeout)
+    if cache.incr(key) > limit:
+        release_slot(key)
+        return None
+    return partial(release_slot, key)
+
+
+def release_slot(key):
+    try:
+        cache.decr(key)
+    except ValueError:
+        # счётчик истёк, пока ответ был открыт
+        pass
+
+
+class SlotStream:
+    """Поток ответа, который освобождает место клиента при закрытии"""
+
+    def __init__(self, stream, release):
+        self.stream = stream
+        self.release = release
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.stream)
+
+    def close(self):
+        # close вызывается, даже если клиент ушёл до первого события
+        self.stream.close()
+        if self.release is not None:
+            self.release()
+            self.release = None
@@ -0,0 +1,116 @@
+import mimetypes
+import os
+import posixpath
+import re
+
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseNotModified,
+    StreamingHttpResponse,
+)
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+DEFAULT_MAX_AGE = 60 * 60
+CHUNK_SIZE = 64 * 1024
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def cache_control(path, immutable):
+    if immutable or HASHED_NAME_RE.search(path):
+        return f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return f'public, max-age={DEFAULT_MAX_AGE}'
+
+
+def pick_encoding(request, fullpath):
+    """Готовая сжатая копия файла, если клиент её принимает."""
+    accepted = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    for encoding, suffix in ENCODINGS:
+        if encoding in accepted and os.path.exists(fullpath + suffix):
+            return encoding, fullpath + suffix
+    return None, fullpath
+
+
+def parse_range(header, size):
+    """Возвращает (start, end) включительно или None, если диапазон
+    не поддерживается; ValueError - если он невыполним."""
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if not start:
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+def read_range(fullpath, start, length):
+    with open(fullpath, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def serve(request, path, document_root, immutable=False):
+    """Отдаёт статику и медиа без CDN: Range, 304 и долгий кэш."""
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        fullpath = safe_join(document_root, path)
+    except ValueError:
+        raise Http404('Файл не найден')
+    if not os.path.isfile(fullpath):
+        raise Http404('Файл не найден')
+    stat = os.stat(fullpath)
+    if not was_modified_since(
+        request.META.get('HTTP_IF_MODIFIED_SINCE'),
+        stat.st_mtime, stat.st_size
+    ):
+        return HttpResponseNotModified()
+    content_type, _ = mimetypes.guess_type(fullpath)
+    content_type = content_type or 'application/octet-stream'
+    range_header = request.META.get('HTTP_RANGE')
+    if range_header:
+        try:
+            byte_range = parse_range(range_header, stat.st_size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+    else:
+        byte_range = None
+    if byte_range:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            read_range(fullpath, start, end - start + 1),
+            status=206,
+            content_type=content_type,
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        response['Content-Length'] = end - start + 1
+    else:
+        encoding, filename = pick_encoding(request, fullpath)
+        response = FileResponse(
+            open(filename, 'rb'), content_type=content_type
+        )
+        if encoding:
+            response['Content-Encoding'] = encoding
+        response['Content-Length'] = os.path.getsize(filename)
+        response['Vary'] = 'Accept-Encoding'
+    response['Accept-Ranges'] = 'bytes'
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = cache_control(path, immutable)
+    return response
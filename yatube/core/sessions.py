@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import (
+    SessionStore as CachedDBStore,
+)
+
+
+class SessionStore(CachedDBStore):
+    """Сессии из кэша с записью в БД, без записи неизменённых данных.
+
+    Django сохраняет сессию, если её пометили изменённой, даже когда
+    туда записали те же значения. Здесь такие сохранения пропускаются.
+    """
+    _loaded_data = None
+
+    def dumps(self, data):
+        return self.serializer().dumps(data)
+
+    def load(self):
+        data = super().load()
+        self._loaded_data = self.dumps(data)
+        return data
+
+    def save(self, must_create=False):
+        unchanged = (
+            not must_create
+            and not settings.SESSION_SAVE_EVERY_REQUEST
+            and self._loaded_data is not None
+            and self._loaded_data == self.dumps(self._get_session())
+        )
+        if unchanged:
+            return
+        super().save(must_create)
+        self._loaded_data = self.dumps(self._session)
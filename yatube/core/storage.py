@@ -0,0 +1,173 @@
+import gzip
+import hashlib
+import os
+import posixpath
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .css import purge_css, used_classes
+from .models import StoredFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_EXTENSIONS = ('.css', '.js', '.svg', '.txt', '.html', '.ico')
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Статика с хешем в имени, урезанным CSS и сжатыми копиями.
+
+    Рядом с каждым текстовым файлом кладутся .gz и, если установлен
+    пакет brotli, .br, чтобы сервер отдавал их без сжатия на лету.
+    """
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            return
+        self.purge_stylesheets(paths)
+        hashed_names = set()
+        for name, hashed_name, processed in super().post_process(
+            paths, dry_run, **options
+        ):
+            if hashed_name and not isinstance(processed, Exception):
+                hashed_names.add(hashed_name)
+            yield name, hashed_name, processed
+        for hashed_name in hashed_names:
+            if hashed_name.endswith(COMPRESS_EXTENSIONS):
+                self.compress(hashed_name)
+
+    def purge_stylesheets(self, paths):
+        """Оставляет в CSS только классы, используемые в шаблонах.
+
+        Хеш считается уже по урезанному файлу, поэтому правка шаблонов
+        меняет имя файла и не ломает долгий кэш браузера.
+        """
+        targets = [
+            name for name in getattr(settings, 'STATIC_PURGE_CSS', ())
+            if name in paths
+        ]
+        if not targets:
+            return
+        classes = used_classes()
+        for name in targets:
+            storage, path = paths[name]
+            with storage.open(path) as source:
+                css = source.read().decode('utf-8')
+            self.delete(name)
+            self._save(
+                name, ContentFile(purge_css(css, classes).encode('utf-8'))
+            )
+            paths[name] = (self, name)
+
+    def compress(self, name):
+        with self.open(name) as source:
+            content = source.read()
+        variants = [('.gz', gzip.compress(content, compresslevel=9))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(content)))
+        for suffix, compressed in variants:
+            if len(compressed) >= len(content):
+                continue
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            self._save(name + suffix, ContentFile(compressed))
+
+
+class ContentAddressedMixin:
+    """Хранит загрузки под именем sha256 содержимого.
+
+    Одинаковые файлы хранятся один раз, число ссылок на каждый файл
+    ведётся в StoredFile. Подходит для любого Storage, в т.ч. объектного.
+    """
+    def save(self, name, content, max_length=None):
+        # имя определяется содержимым, get_available_name не нужен
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        return self._save(name, content)
+
+    def get_available_name(self, name, max_length=None):
+        # вызывается, только если файл с этим содержимым уже записал
+        # параллельный запрос
+        raise FileExistsError(name)
+
+    def _save(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        directory, filename = posixpath.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        hexdigest = digest.hexdigest()
+        name = posixpath.join(
+            directory, hexdigest[:2], hexdigest + extension
+        )
+        # ссылка учитывается до записи файла: строка StoredFile остаётся
+        # заблокированной до коммита, и release не удалит файл между
+        # проверкой exists() и записью
+        with transaction.atomic():
+            retain(name)
+            if not self.exists(name):
+                try:
+                    name = super()._save(name, content)
+                except FileExistsError:
+                    pass
+        return name
+
+
+class ContentAddressedStorage(ContentAddressedMixin, FileSystemStorage):
+    pass
+
+
+def retain(name):
+    """Увеличивает число ссылок на файл, создавая запись при первой"""
+    with transaction.atomic():
+        if StoredFile.objects.filter(name=name).update(
+            ref_count=F('ref_count') + 1
+        ):
+            return
+        try:
+            with transaction.atomic():
+                StoredFile.objects.create(name=name, ref_count=1)
+        except IntegrityError:
+            # запись одновременно создал другой запрос
+            StoredFile.objects.filter(name=name).update(
+                ref_count=F('ref_count') + 1
+            )
+
+
+def release(name, storage=default_storage):
+    """Уменьшает число ссылок на файл, после коммита удаляет ненужный.
+
+    Файл удаляется только после коммита: если транзакция откатится,
+    строка вернётся со своим числом ссылок, и файл должен остаться.
+    Файлы, сохранённые не через ContentAddressedMixin, не трогаем.
+    """
+    if not name:
+        return
+    with transaction.atomic():
+        updated = StoredFile.objects.filter(
+            name=name, ref_count__gt=0
+        ).update(ref_count=F('ref_count') - 1)
+        if updated:
+            transaction.on_commit(
+                lambda: delete_unreferenced(name, storage)
+            )
+
+
+def delete_unreferenced(name, storage=default_storage):
+    """Удаляет файл, если ссылок на него так и не появилось.
+
+    Удаление строки и файла идут в одной транзакции под блокировкой
+    строки, параллельный retain дождётся её конца.
+    """
+    with transaction.atomic():
+        if StoredFile.objects.filter(name=name, ref_count=0).delete()[0]:
+            storage.delete(name)
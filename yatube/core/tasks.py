@@ -0,0 +1,13 @@
+from .jobs import enqueue, task
+from .mail import deliver_batch, next_attempt_delay, prune_outbox
+
+
+@task(priority=5)
+def deliver_outbox():
+    """Отправляет готовые письма пачками, отложенные - следующей задачей"""
+    while deliver_batch():
+        pass
+    prune_outbox()
+    delay = next_attempt_delay()
+    if delay is not None:
+        enqueue(deliver_outbox, delay=delay)
@@ -0,0 +1,24 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from core.cache import HOLE_MARKER
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, template_name, **kwargs):
+    """Персональный фрагмент страницы.
+
+    Внутри shared_cache_page на его месте остаётся метка, которая
+    заполняется при каждом ответе; иначе работает как обычный include.
+    Параметры должны быть простыми значениями - они хранятся в кэше.
+    """
+    request = context.get('request')
+    holes = getattr(request, 'page_holes', None)
+    if holes is not None:
+        holes.append((template_name, kwargs))
+        return mark_safe(HOLE_MARKER.format(len(holes) - 1))
+    included = context.template.engine.get_template(template_name)
+    with context.push(**kwargs):
+        return included.render(context)
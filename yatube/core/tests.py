@@ -1,6 +1,40 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import Future
 from http import HTTPStatus
+from io import BytesIO, StringIO
 
-from django.test import TestCase
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import (
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import reverse
+from django.utils import timezone
+
+from PIL import Image
+
+from .auth import USER_CACHE_KEY
+from .css import purge_css
+from . import pubsub
+from .images import downscale
+from .jobs import Worker, enqueue, prune_jobs, task
+from .mail import next_attempt_delay, prune_outbox, requeue_stale
+from .models import Channel, Job, OutgoingEmail
+from .sessions import SessionStore
+from .serve import serve
 
 
 class ViewTestClass(TestCase):
@@ -10,3 +44,367 @@ class ViewTestClass(TestCase):
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         error_name = 'Ошибка: страница 404 использует не кастомный шаблон'
         self.assertTemplateUsed(response, 'core/404.html', error_name)
+
+
+class StartupProfileTests(TestCase):
+    def test_startup_profile_reports_apps(self):
+        """startup_profile выводит время импорта каждого приложения."""
+        out = StringIO()
+        call_command('startup_profile', stdout=out)
+        for app in settings.STARTUP_PROFILE_APPS:
+            with self.subTest(app=app):
+                self.assertIn(f'{app}: ', out.getvalue())
+
+    def test_startup_profile_budget(self):
+        """Превышение бюджета старта приводит к ошибке."""
+        with self.assertRaises(CommandError):
+            call_command('startup_profile', budget=0, stdout=StringIO())
+
+
+class StaticPipelineTests(TestCase):
+    CSS = (
+        '/* bootstrap */body{margin:0}.btn{color:red}.unused{color:blue}'
+        '.nav .active{color:green}'
+        '@media (min-width:576px){.container{width:540px}.gone{top:0}}'
+    )
+
+    def setUp(self):
+        self.source = tempfile.mkdtemp()
+        self.root = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.source, 'css'))
+        with open(os.path.join(self.source, 'css', 'site.css'), 'w') as f:
+            f.write(self.CSS * 20)
+
+    def tearDown(self):
+        shutil.rmtree(self.source, ignore_errors=True)
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_purge_css(self):
+        """Из CSS удаляются правила для классов, которых нет в шаблонах."""
+        purged = purge_css(self.CSS, {'btn', 'nav', 'active', 'container'})
+        self.assertEqual(
+            purged,
+            'body{margin:0}.btn{color:red}.nav .active{color:green}'
+            '@media (min-width:576px){.container{width:540px}}'
+        )
+
+    def test_collectstatic_hashes_and_compresses(self):
+        """collectstatic кладёт урезанный файл с хешем и его .gz копию."""
+        with override_settings(
+            STATICFILES_DIRS=[self.source],
+            STATIC_ROOT=self.root,
+            STATIC_PURGE_CSS=['css/site.css'],
+            STATICFILES_STORAGE=(
+                'core.storage.CompressedManifestStaticFilesStorage'
+            ),
+        ):
+            call_command('collectstatic', interactive=False, verbosity=0)
+        with open(os.path.join(self.root, 'staticfiles.json')) as f:
+            hashed = json.load(f)['paths']['css/site.css']
+        self.assertRegex(hashed, r'^css/site\.[0-9a-f]{12}\.css$')
+        with open(os.path.join(self.root, hashed)) as f:
+            self.assertNotIn('.unused', f.read())
+        self.assertTrue(
+            os.path.exists(os.path.join(self.root, hashed + '.gz'))
+        )
+
+    def test_serve_range_and_cache_headers(self):
+        """Сервер статики отдаёт Range и immutable для имён с хешем."""
+        name = 'site.0123456789ab.css'
+        with open(os.path.join(self.root, name), 'w') as f:
+            f.write('0123456789')
+        factory = RequestFactory()
+        response = serve(
+            factory.get('/', HTTP_RANGE='bytes=2-5'), name, self.root
+        )
+        self.assertEqual(response.status_code, HTTPStatus.PARTIAL_CONTENT)
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertIn('immutable', response['Cache-Control'])
+        response = serve(
+            factory.get('/', HTTP_RANGE='bytes=20-'), name, self.root
+        )
+        self.assertEqual(
+            response.status_code, HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE
+        )
+
+
+class ImageProcessingTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'photo.jpg')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_downscale_strips_exif_and_caps_size(self):
+        """Картинка уменьшается, поворачивается по EXIF и теряет EXIF."""
+        exif = Image.Exif()
+        exif[0x0112] = 6  # повернуть на 90 градусов
+        Image.new('RGB', (400, 200)).save(self.path, exif=exif.tobytes())
+        content = downscale(self.path, (100, 100), 10 ** 6)
+        with Image.open(BytesIO(content)) as image:
+            self.assertEqual(image.size, (50, 100))
+            self.assertNotIn('exif', image.info)
+
+    def test_small_image_left_as_is(self):
+        """Подходящая картинка без EXIF не перекодируется."""
+        Image.new('RGB', (40, 20)).save(self.path)
+        self.assertIsNone(downscale(self.path, (100, 100), 10 ** 6))
+
+
+class SessionTests(TestCase):
+    def test_unchanged_session_not_saved(self):
+        """Сессия с теми же данными не перезаписывается."""
+        store = SessionStore()
+        store['cart'] = [1, 2]
+        store.create()
+        store = SessionStore(store.session_key)
+        store['cart'] = [1, 2]
+        with self.assertNumQueries(0):
+            store.save()
+        store['cart'] = [3]
+        store.save()
+        self.assertEqual(SessionStore(store.session_key)['cart'], [3])
+
+    def test_purge_sessions(self):
+        """purge_sessions удаляет только истёкшие сессии."""
+        now = timezone.now()
+        for i in range(5):
+            Session.objects.create(
+                session_key=f'expired{i}', session_data='',
+                expire_date=now - timezone.timedelta(days=1),
+            )
+        Session.objects.create(
+            session_key='alive', session_data='',
+            expire_date=now + timezone.timedelta(days=1),
+        )
+        call_command('purge_sessions', batch_size=2, stdout=StringIO())
+        self.assertEqual(
+            list(Session.objects.values_list('pk', flat=True)), ['alive']
+        )
+
+    def test_cached_user(self):
+        """Пользователь страницы берётся из кэша до смены пароля."""
+        user = get_user_model().objects.create_user(
+            username='cached', password='old-password'
+        )
+        self.client.force_login(user)
+        url = reverse('about:author')
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.context['user'], user)
+        self.assertNotIn(
+            user.password, str(cache.get(USER_CACHE_KEY.format(user.pk)))
+        )
+        user.set_password('new-password')
+        user.save()
+        response = self.client.get(url)
+        self.assertFalse(response.context['user'].is_authenticated)
+
+
+class PubSubTests(TransactionTestCase):
+    def test_wait_wakes_on_publish(self):
+        """Подписчик просыпается сразу после публикации."""
+        version = pubsub.wait('test-channel', None, 0)
+        timer = threading.Timer(0.1, pubsub.publish, ['test-channel'])
+        timer.start()
+        self.assertNotEqual(pubsub.wait('test-channel', version, 5), version)
+        timer.join()
+
+    def test_wait_timeout(self):
+        """Без публикаций ожидание заканчивается по таймауту."""
+        version = pubsub.wait('quiet-channel', None, 0)
+        self.assertEqual(pubsub.wait('quiet-channel', version, 0.1), version)
+
+    def test_publish_from_other_worker(self):
+        """Публикацию в другом процессе подписчик видит по версии в БД."""
+        version = pubsub.wait('shared-channel', None, 0)
+        # другой воркер: версия в БД меняется без уведомления в процессе
+        Channel.objects.update_or_create(
+            name='shared-channel', defaults={'version': version + 1}
+        )
+        self.assertEqual(
+            pubsub.wait('shared-channel', version, 5), version + 1
+        )
+
+
+CALLS = []
+
+
+@task(name='core.tests.record', max_attempts=2)
+def record(value: int, fail: bool = False):
+    if fail:
+        raise ValueError('не получилось')
+    CALLS.append(value)
+
+
+@override_settings(
+    JOB_QUEUES={'default': {'concurrency': 2, 'pool': 'inline'}}
+)
+class JobTests(TransactionTestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def run_workers(self):
+        call_command('run_workers', once=True, stdout=StringIO())
+
+    def test_priority(self):
+        """Задачи выполняются по приоритету."""
+        enqueue(record, (1,))
+        enqueue(record, (2,), priority=5)
+        self.run_workers()
+        self.assertEqual(CALLS, [2, 1])
+        self.assertFalse(Job.objects.exclude(status=Job.DONE).exists())
+
+    def test_retry_with_backoff(self):
+        """Упавшая задача повторяется позже, пока есть попытки."""
+        record.enqueue(3, fail=True)
+        self.run_workers()
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('не получилось', job.last_error)
+        Job.objects.update(run_at=timezone.now())
+        self.run_workers()
+        self.assertEqual(Job.objects.get().status, Job.FAILED)
+
+    def test_stale_job_counts_as_attempt(self):
+        """Задача, бросившая воркер, не возвращается в очередь вечно."""
+        record.enqueue(4)
+        Job.objects.update(
+            status=Job.RUNNING,
+            attempts=2,
+            started_at=timezone.now() - timezone.timedelta(days=1),
+        )
+        self.run_workers()
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(CALLS, [])
+
+    def test_long_job_kept_by_heartbeat(self):
+        """Долгая задача живого воркера не возвращается в очередь."""
+        record.enqueue(6)
+        worker = Worker()
+        job = list(worker.claim('default', 1))[0]
+        future = Future()
+        worker.running[future] = job
+        job.started_at = timezone.now() - timezone.timedelta(days=1)
+        Job.objects.update(started_at=job.started_at)
+        worker.heartbeat()
+        worker.requeue_stale()
+        self.assertEqual(Job.objects.get().status, Job.RUNNING)
+        # строку забрал другой воркер: результат этого её не перезапишет
+        Job.objects.update(started_at=timezone.now())
+        future.set_result(None)
+        worker.collect()
+        self.assertEqual(Job.objects.get().status, Job.RUNNING)
+
+    def test_old_jobs_pruned(self):
+        """Старые выполненные задачи удаляются."""
+        record.enqueue(5)
+        self.run_workers()
+        Job.objects.update(run_at=timezone.now() - timezone.timedelta(
+            days=settings.JOB_RETENTION_DAYS + 1
+        ))
+        self.assertEqual(prune_jobs(), 1)
+        self.assertFalse(Job.objects.exists())
+
+    def test_arguments_checked(self):
+        """Аргументы сверяются с аннотациями при постановке в очередь."""
+        with self.assertRaises(TypeError):
+            record.enqueue('3')
+
+
+class FailingBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ConnectionError('SMTP недоступен')
+
+
+class ClosedBackend(BaseEmailBackend):
+    def open(self):
+        raise ConnectionError('SMTP не отвечает')
+
+    def send_messages(self, email_messages):
+        return len(email_messages)
+
+
+@override_settings(
+    EMAIL_BACKEND='core.mail.OutboxEmailBackend',
+    OUTBOX_EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    JOB_QUEUES={'default': {'concurrency': 2, 'pool': 'inline'}},
+)
+class OutboxTests(TransactionTestCase):
+    def run_workers(self):
+        call_command('run_workers', once=True, stdout=StringIO())
+
+    def test_password_reset_sent_in_background(self):
+        """Сброс пароля только ставит задачу, письмо уходит воркером."""
+        get_user_model().objects.create_user(
+            username='forgetful', email='forgetful@yatube.ru', password='pw'
+        )
+        response = self.client.post(
+            reverse('users:password_reset_form'),
+            {'email': 'forgetful@yatube.ru'},
+        )
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        self.assertEqual(len(mail.outbox), 0)
+        self.run_workers()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['forgetful@yatube.ru'])
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(email.status, OutgoingEmail.SENT)
+        # ссылка для сброса пароля в таблице не остаётся
+        self.assertEqual(email.body, '')
+        OutgoingEmail.objects.update(
+            created=timezone.now() - timezone.timedelta(
+                days=settings.OUTBOX_RETENTION_DAYS + 1
+            )
+        )
+        self.assertEqual(prune_outbox(), 1)
+
+    @override_settings(OUTBOX_EMAIL_BACKEND='core.tests.FailingBackend')
+    def test_failed_email_retried_later(self):
+        """Неотправленное письмо остаётся в очереди с паузой."""
+        mail.send_mail('Тема', 'Текст', 'from@yatube.ru', ['to@yatube.ru'])
+        self.run_workers()
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(email.status, OutgoingEmail.QUEUED)
+        self.assertEqual(email.attempts, 1)
+        self.assertGreater(email.send_after, timezone.now())
+        self.assertIn('SMTP недоступен', email.last_error)
+
+    @override_settings(OUTBOX_EMAIL_BACKEND='core.tests.ClosedBackend')
+    def test_connection_failure_retried_later(self):
+        """Если сервер не открывает соединение, пачка ждёт повтора."""
+        mail.send_mail('Тема', 'Текст', 'from@yatube.ru', ['to@yatube.ru'])
+        self.run_workers()
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(email.status, OutgoingEmail.QUEUED)
+        self.assertEqual(email.attempts, 1)
+        self.assertIn('SMTP не отвечает', email.last_error)
+        self.assertTrue(Job.objects.filter(
+            status=Job.QUEUED, run_at__gt=timezone.now()
+        ).exists())
+
+    def test_stale_sending_counts_attempt(self):
+        """Брошенная отправка считается попыткой и не повторяется вечно."""
+        mail.send_mail('Тема', 'Текст', 'from@yatube.ru', ['to@yatube.ru'])
+        claimed_at = timezone.now()
+        OutgoingEmail.objects.update(
+            status=OutgoingEmail.SENDING,
+            claimed_at=claimed_at,
+            attempts=settings.OUTBOX_MAX_ATTEMPTS - 1,
+        )
+        # повтор назначается на момент, когда отправку можно считать брошенной
+        self.assertGreater(next_attempt_delay(), settings.JOB_TIMEOUT - 60)
+        OutgoingEmail.objects.update(
+            claimed_at=claimed_at - timezone.timedelta(
+                seconds=settings.JOB_TIMEOUT + 1
+            )
+        )
+        requeue_stale()
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(email.status, OutgoingEmail.FAILED)
+        self.assertEqual(email.attempts, settings.OUTBOX_MAX_ATTEMPTS)
@@ -1,16 +1,131 @@
 from django.contrib import admin
+from django.contrib.auth.admin import UserAdmin
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db import connection
+from django.utils.functional import cached_property
 
-from .models import Group, Post
+from .deletion import request_deletion
+from .models import Group, PendingDeletion, Post, User
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор без точного COUNT по всей таблице.
+
+    Для нефильтрованного списка берёт оценку из статистики БД
+    (pg_class в PostgreSQL, sqlite_stat1 после ANALYZE в SQLite), а без
+    статистики считает как обычно. Оценка может разойтись с таблицей,
+    поэтому страница за концом списка открывается пустой, а не ошибкой.
+    """
+    @cached_property
+    def count(self):
+        if self.object_list.query.where:
+            return super().count
+        estimate = self.estimate(self.object_list.model._meta.db_table)
+        return super().count if estimate is None else estimate
+
+    @staticmethod
+    def estimate(table):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE relname = %s',
+                    [table],
+                )
+            elif connection.vendor == 'sqlite':
+                cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+                )
+                if cursor.fetchone() is None:
+                    return None
+                # первое число в stat - число строк таблицы
+                cursor.execute(
+                    'SELECT stat FROM sqlite_stat1 WHERE tbl = %s', [table]
+                )
+            else:
+                return None
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        estimate = int(str(row[0]).split()[0])
+        return estimate if estimate > 0 else None
+
+    def validate_number(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('Номер страницы - не целое число')
+        if number < 1:
+            raise EmptyPage('Номер страницы меньше 1')
+        return number
+
+
+class BackgroundDeleteMixin:
+    """Удаление через PendingDeletion вместо коллектора Django.
+
+    Страница подтверждения не собирает связанные объекты, а сами
+    объекты удаляет команда purge_deleted.
+    """
+    def get_deleted_objects(self, objs, request):
+        objs = list(objs)
+        return (
+            [str(obj) for obj in objs],
+            {self.opts.verbose_name_plural: len(objs)},
+            set(),
+            [],
+        )
+
+    def delete_model(self, request, obj):
+        request_deletion(obj)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            request_deletion(obj)
 
 
 @admin.register(Post)
 class Admin(admin.ModelAdmin):
     """Создаем админку с параметрами и фильтрацией"""
     list_display = ('pk', 'text', 'pub_date', 'author', 'group',)
+    list_select_related = ('author', 'group',)
     search_fields = ('text',)
     list_filter = ('pub_date',)
     list_editable = ('group',)
+    raw_id_fields = ('author', 'group',)
     empty_value_display = '-пусто-'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по индексам: число - pk поста, @имя - автор.
+
+        Остальные запросы ищутся по тексту как раньше.
+        """
+        search_term = search_term.strip()
+        if search_term.isdigit():
+            return queryset.filter(pk=search_term), False
+        if search_term.startswith('@'):
+            return queryset.filter(author__username=search_term[1:]), False
+        return super().get_search_results(request, queryset, search_term)
+
+
+@admin.register(Group)
+class GroupAdmin(BackgroundDeleteMixin, admin.ModelAdmin):
+    """Счётчики постов берём из денормализованных полей"""
+    list_display = ('pk', 'title', 'slug', 'post_count', 'last_post_at',)
+    search_fields = ('title',)
+    prepopulated_fields = {'slug': ('title',)}
+
+
+admin.site.unregister(User)
+
+
+@admin.register(User)
+class AuthorAdmin(BackgroundDeleteMixin, UserAdmin):
+    pass
 
 
-admin.site.register(Group)
+@admin.register(PendingDeletion)
+class PendingDeletionAdmin(admin.ModelAdmin):
+    """Ход фонового удаления"""
+    list_display = ('pk', 'kind', 'title', 'purged', 'requested_at',)
+    list_filter = ('kind',)
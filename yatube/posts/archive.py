@@ -0,0 +1,55 @@
+from django.db import transaction
+
+from core.storage import retain
+from .likes import COMMENT, POST, load_counts
+from .models import ArchivedComment, ArchivedPost, Comment, Post
+
+POST_FIELDS = (
+    'id', 'text', 'text_html', 'excerpt_html', 'pub_date', 'author_id',
+    'group_id', 'image', 'view_count',
+)
+COMMENT_FIELDS = ('id', 'post_id', 'author_id', 'text', 'text_html', 'created')
+
+
+def archive_batch(before, batch_size):
+    """Переносит в архив одну пачку постов старше before вместе
+    с комментариями. Удаление поста стирает его лайки, поэтому их число
+    переносится в архивную копию. Возвращает число перенесённых постов."""
+    with transaction.atomic():
+        posts = list(
+            Post.objects.filter(pub_date__lt=before).order_by('pk').values(
+                *POST_FIELDS
+            )[:batch_size]
+        )
+        if not posts:
+            return 0
+        ids = [post['id'] for post in posts]
+        likes = load_counts(POST, ids)
+        ArchivedPost.objects.bulk_create(
+            ArchivedPost(like_count=likes[post['id']], **post)
+            for post in posts
+        )
+        comments = list(
+            Comment.objects.filter(post_id__in=ids).values(*COMMENT_FIELDS)
+        )
+        likes = load_counts(COMMENT, [comment['id'] for comment in comments])
+        ArchivedComment.objects.bulk_create(
+            ArchivedComment(like_count=likes[comment['id']], **comment)
+            for comment in comments
+        )
+        for post in posts:
+            # архивная копия тоже ссылается на картинку, удаление поста
+            # из горячей таблицы не должно её стереть
+            if post['image']:
+                retain(post['image'])
+        Post.objects.filter(pk__in=ids).delete()
+    return len(posts)
+
+
+def archive_posts(before, batch_size=500):
+    """Переносит все посты старше before пачками, отдаёт прогресс."""
+    while True:
+        moved = archive_batch(before, batch_size)
+        if not moved:
+            return
+        yield moved
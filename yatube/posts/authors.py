@@ -0,0 +1,103 @@
+"""Кэш авторов для страниц профиля, подписок и карточек постов.
+
+username -> id хранится вместе с отрицательным кэшем для несуществующих
+имён, id -> основные поля пользователя, отдельно - счётчики профиля.
+"""
+from django.core.cache import cache
+
+from .models import Follow, Post, User
+
+USERNAME_KEY = 'username:{}'
+AUTHOR_KEY = 'author:{}'
+COUNTERS_KEY = 'author_counters:{}'
+AUTHOR_FIELDS = ('id', 'username', 'first_name', 'last_name')
+AUTHOR_TIMEOUT = 60 * 60
+MISSING_TIMEOUT = 60
+# отрицательный кэш: такого пользователя нет
+MISSING = 0
+
+
+def _to_user(values):
+    """Пользователь только с основными полями, остальные отложены."""
+    return User.from_db('default', AUTHOR_FIELDS, values)
+
+
+def _load(ids):
+    rows = User.objects.filter(pk__in=ids).values_list(*AUTHOR_FIELDS)
+    found = {row[0]: row for row in rows}
+    cache.set_many(
+        {AUTHOR_KEY.format(pk): row for pk, row in found.items()},
+        AUTHOR_TIMEOUT,
+    )
+    return found
+
+
+def get_authors(ids):
+    """id -> пользователь: один запрос к кэшу и один к БД на промахи."""
+    ids = set(ids)
+    cached = cache.get_many([AUTHOR_KEY.format(pk) for pk in ids])
+    rows = {row[0]: row for row in cached.values()}
+    missing = ids - set(rows)
+    if missing:
+        rows.update(_load(missing))
+    return {pk: _to_user(row) for pk, row in rows.items()}
+
+
+def resolve_id(username):
+    """id пользователя по имени или None."""
+    key = USERNAME_KEY.format(username)
+    user_id = cache.get(key)
+    if user_id is None:
+        user_id = User.objects.filter(username=username).values_list(
+            'pk', flat=True
+        ).first() or MISSING
+        cache.set(
+            key, user_id, MISSING_TIMEOUT if user_id == MISSING
+            else AUTHOR_TIMEOUT
+        )
+    return user_id or None
+
+
+def get_author(username):
+    user_id = resolve_id(username)
+    if user_id is None:
+        return None
+    return get_authors([user_id]).get(user_id)
+
+
+def get_counters(author_id):
+    """Число постов, подписок и подписчиков автора.
+
+    Три отдельных COUNT по индексам: один запрос с тремя JOIN
+    перемножил бы посты, подписки и подписчиков до DISTINCT.
+    """
+    key = COUNTERS_KEY.format(author_id)
+    counters = cache.get(key)
+    if counters is None:
+        counters = {
+            'posts': Post.objects.filter(author_id=author_id).count(),
+            'follows': Follow.objects.filter(user_id=author_id).count(),
+            'followers': Follow.objects.filter(author_id=author_id).count(),
+        }
+        cache.set(key, counters, AUTHOR_TIMEOUT)
+    return counters
+
+
+def attach_authors(posts):
+    """Подставляет авторов из кэша, чтобы карточки не ходили в БД."""
+    authors = get_authors(post.author_id for post in posts)
+    for post in posts:
+        if post.author_id in authors:
+            post.author = authors[post.author_id]
+    return posts
+
+
+def invalidate_user(user_id, *usernames):
+    cache.delete_many(
+        [AUTHOR_KEY.format(user_id), COUNTERS_KEY.format(user_id)]
+        + [USERNAME_KEY.format(name) for name in usernames if name]
+    )
+
+
+def invalidate_counters(*user_ids):
+    cache.delete_many([COUNTERS_KEY.format(pk) for pk in user_ids])
@@ -2,3 +2,35 @@ POSTS_PER_PAGE = 10
 POST_LENGTH = 30
 TEXT_BACK_LIMIT = 15
 POSTS_FOR_BULK_CREATE = 13
+SUGGESTIONS_COUNT = 5
+SUGGESTION_FRIEND_WEIGHT = 1.0
+SUGGESTION_GROUP_WEIGHT = 0.5
+# пользователей в одной транзакции пересчёта рекомендаций
+SUGGESTION_BATCH_SIZE = 500
+FEED_SINCE_LIMIT = 50
+FEED_POLL_INTERVAL = 1
+FEED_MAX_WAIT = 25
+FEED_STREAM_DURATION = 60
+COMMENT_STREAM_DURATION = 300
+PAGINATOR_WINDOW = 2
+PAGINATOR_EDGE = 1
+EXCERPT_LENGTH = 300
+RENDER_BATCH_SIZE = 500
+# на страницах-списках нужен только анонс поста
+LIST_DEFERRED = ('text', 'text_html')
+DELETION_BATCH_SIZE = 200
+DIGEST_BATCH_SIZE = 1000
+# первая рассылка берёт посты за последние сутки
+DIGEST_FIRST_PERIOD_DAYS = 1
+# запуск рассылки, не сохранявший прогресс столько секунд, считается упавшим
+DIGEST_RUN_TIMEOUT = 15 * 60
+# буфер просмотров сбрасывается в БД не реже раза в столько секунд
+# или по накоплении стольких просмотров
+VIEW_FLUSH_INTERVAL = 10
+VIEW_FLUSH_SIZE = 1000
+# в UPDATE по три параметра на пост, а старый SQLite принимает до 999
+VIEW_UPDATE_CHUNK = 300
+STATS_HOURS = 48
+STATS_TOP_POSTS = 10
+# строк-шардов в счётчике лайков одного поста или комментария
+LIKE_SHARDS = 16
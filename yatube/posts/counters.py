@@ -0,0 +1,144 @@
+"""Счётчики просмотров постов с буфером в памяти воркера.
+
+Просмотр только увеличивает счётчик в словаре. Фоновый поток воркера
+раз в VIEW_FLUSH_INTERVAL секунд записывает накопленные приращения в БД:
+пачками UPDATE в Post.view_count и в почасовые PostViewHour. Если воркер
+упадёт, потеряются только просмотры последних секунд. Поток запускает
+yatube/wsgi.py через start_flusher(), без него (в тестах и командах)
+буфер сбрасывается только по размеру или вызовом flush().
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from itertools import islice
+
+from django.db import connection, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from .constants import (
+    VIEW_FLUSH_INTERVAL, VIEW_FLUSH_SIZE, VIEW_UPDATE_CHUNK
+)
+from .models import Post, PostViewHour
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+# {начало часа: Counter({post_id: просмотров})}
+_buffer = defaultdict(Counter)
+_state = {'pending': 0, 'background': False, 'flusher': None}
+
+
+def current_hour():
+    return timezone.now().replace(minute=0, second=0, microsecond=0)
+
+
+def record_view(post_id):
+    """Учитывает просмотр; сбрасывает буфер в БД, если он переполнен"""
+    with _lock:
+        _buffer[current_hour()][post_id] += 1
+        _state['pending'] += 1
+        due = _state['pending'] >= VIEW_FLUSH_SIZE
+        flusher = _state['flusher']
+        # после fork потоки родителя в воркере не работают
+        start = _state['background'] and not (
+            flusher and flusher.is_alive()
+        )
+        if start:
+            flusher = _state['flusher'] = threading.Thread(
+                target=_flush_forever, name='view-counters', daemon=True
+            )
+    if start:
+        flusher.start()
+    if due:
+        flush()
+
+
+def start_flusher():
+    """Включает фоновый сброс буфера и сброс при выходе из процесса"""
+    with _lock:
+        if _state['background']:
+            return
+        _state['background'] = True
+    atexit.register(flush)
+
+
+def _flush_forever():
+    while True:
+        time.sleep(VIEW_FLUSH_INTERVAL)
+        flush()
+        # между сбросами потоку соединение с БД не нужно
+        connection.close()
+
+
+def _increment(counts, key='pk'):
+    """CASE key WHEN ... THEN n END: приращения всех строк одним UPDATE"""
+    return Case(
+        *[
+            When(**{key: pk}, then=Value(count))
+            for pk, count in counts.items()
+        ],
+        default=Value(0),
+    )
+
+
+def flush():
+    """Записывает накопленные приращения; при ошибке возвращает их в буфер"""
+    global _buffer
+    with _lock:
+        buffer, _buffer = _buffer, defaultdict(Counter)
+        _state['pending'] = 0
+    if not buffer:
+        return
+    try:
+        _write(buffer)
+    except Exception:
+        logger.exception('Не удалось записать просмотры')
+        with _lock:
+            for hour, counts in buffer.items():
+                _buffer[hour].update(counts)
+                _state['pending'] += sum(counts.values())
+
+
+def _chunks(ids):
+    ids = iter(sorted(ids))
+    while True:
+        chunk = list(islice(ids, VIEW_UPDATE_CHUNK))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _write(buffer):
+    totals = Counter()
+    for counts in buffer.values():
+        totals.update(counts)
+    # посты, удалённые после просмотра, пропускаем
+    existing = set()
+    for chunk in _chunks(totals):
+        existing.update(
+            Post.objects.filter(pk__in=chunk).values_list('pk', flat=True)
+        )
+    if not existing:
+        return
+    with transaction.atomic():
+        for hour, counts in buffer.items():
+            ids = [pk for pk in counts if pk in existing]
+            PostViewHour.objects.bulk_create(
+                [PostViewHour(post_id=pk, hour=hour) for pk in ids],
+                ignore_conflicts=True,
+            )
+            for chunk in _chunks(ids):
+                PostViewHour.objects.filter(
+                    hour=hour, post_id__in=chunk
+                ).update(views=F('views') + _increment(
+                    {pk: counts[pk] for pk in chunk}, 'post_id'
+                ))
+        for chunk in _chunks(existing):
+            Post.objects.filter(pk__in=chunk).update(
+                view_count=F('view_count') + _increment(
+                    {pk: totals[pk] for pk in chunk}
+                )
+            )
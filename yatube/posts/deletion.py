@@ -0,0 +1,164 @@
+"""Фоновое удаление пользователей и групп с большой историей.
+
+Удаление через коллектор Django загружает в память все связанные строки
+и удаляет их одной длинной транзакцией. Вместо этого объект помечается
+удалённым (PendingDeletion) и сразу пропадает из лент, а его посты,
+комментарии и подписки удаляются небольшими пачками командой
+purge_deleted.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q
+
+from core.cache import bump_version
+from .constants import DELETION_BATCH_SIZE
+from .likes import KINDS as LIKE_KINDS, forget_likes
+from .models import (
+    ArchivedComment,
+    ArchivedPost,
+    Comment,
+    CommentLike,
+    Digest,
+    Follow,
+    FollowSuggestion,
+    Group,
+    PendingDeletion,
+    Post,
+    PostLike,
+    PostViewHour,
+    User,
+)
+
+HIDDEN_CACHE_KEY = 'pending_deletions'
+HIDDEN_CACHE_TIMEOUT = 60 * 60
+LIKE_MODELS = tuple(like for like, _, _ in LIKE_KINDS.values())
+
+
+def hidden_ids():
+    """{'user': frozenset(id), 'group': frozenset(id)} удаляемых объектов"""
+    hidden = cache.get(HIDDEN_CACHE_KEY)
+    if hidden is None:
+        hidden = {PendingDeletion.USER: set(), PendingDeletion.GROUP: set()}
+        for kind, object_id in PendingDeletion.objects.values_list(
+            'kind', 'object_id'
+        ):
+            hidden[kind].add(object_id)
+        hidden = {kind: frozenset(ids) for kind, ids in hidden.items()}
+        cache.set(HIDDEN_CACHE_KEY, hidden, HIDDEN_CACHE_TIMEOUT)
+    return hidden
+
+
+def hide_deleted(posts):
+    """Убирает посты (или комментарии) удаляемых авторов.
+
+    Посты удаляемой группы остаются (on_delete=SET_NULL), группа у них
+    скрывается в attach_groups.
+    """
+    hidden = hidden_ids()[PendingDeletion.USER]
+    if hidden:
+        posts = posts.exclude(author_id__in=hidden)
+    return posts
+
+
+def _changed():
+    cache.delete(HIDDEN_CACHE_KEY)
+    bump_version('posts')
+    bump_version('groups')
+
+
+def request_deletion(obj):
+    """Помечает пользователя или группу удалёнными, удаление - фоном"""
+    kind = PendingDeletion.USER if isinstance(obj, User) else (
+        PendingDeletion.GROUP
+    )
+    with transaction.atomic():
+        deletion, _ = PendingDeletion.objects.get_or_create(
+            kind=kind, object_id=obj.pk, defaults={'title': str(obj)[:200]}
+        )
+        if kind == PendingDeletion.USER and obj.is_active:
+            # больше не войдёт, активные сессии разлогинятся
+            obj.is_active = False
+            obj.save(update_fields=['is_active'])
+        transaction.on_commit(_changed)
+    return deletion
+
+
+def _user_steps(user_id):
+    """Что удалить до самого пользователя, по порядку.
+
+    Сначала его лайки, чтобы вычесть их из счётчиков, затем комментарии
+    к его постам, чтобы удаление поста не тянуло за собой тысячи чужих
+    комментариев.
+    """
+    return [
+        PostLike.objects.filter(user_id=user_id),
+        CommentLike.objects.filter(user_id=user_id),
+        Comment.objects.filter(
+            Q(author_id=user_id) | Q(post__author_id=user_id)
+        ),
+        ArchivedComment.objects.filter(
+            Q(author_id=user_id) | Q(post__author_id=user_id)
+        ),
+        Follow.objects.filter(Q(user_id=user_id) | Q(author_id=user_id)),
+        FollowSuggestion.objects.filter(
+            Q(user_id=user_id) | Q(author_id=user_id)
+        ),
+        Digest.objects.filter(user_id=user_id),
+        PostViewHour.objects.filter(post__author_id=user_id),
+        Post.objects.filter(author_id=user_id),
+        ArchivedPost.objects.filter(author_id=user_id),
+    ]
+
+
+def _group_steps(group_id):
+    """Посты остаются, у них только убирается группа"""
+    return [
+        Post.objects.filter(group_id=group_id),
+        ArchivedPost.objects.filter(group_id=group_id),
+    ]
+
+
+def purge_batch(deletion, batch_size=DELETION_BATCH_SIZE):
+    """Обрабатывает одну пачку строк удаляемого объекта.
+
+    Возвращает число обработанных строк; 0 значит, что связанных строк
+    не осталось и удалены сам объект и отметка об удалении.
+    """
+    if deletion.kind == PendingDeletion.USER:
+        steps, model = _user_steps(deletion.object_id), User
+    else:
+        steps, model = _group_steps(deletion.object_id), Group
+    for rows in steps:
+        ids = list(rows.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            continue
+        batch = rows.model.objects.filter(pk__in=ids)
+        with transaction.atomic():
+            if model is Group:
+                batch.update(group=None)
+            else:
+                if rows.model in LIKE_MODELS:
+                    forget_likes(batch)
+                batch.delete()
+            PendingDeletion.objects.filter(pk=deletion.pk).update(
+                purged=F('purged') + len(ids)
+            )
+        deletion.purged += len(ids)
+        return len(ids)
+    with transaction.atomic():
+        model.objects.filter(pk=deletion.object_id).delete()
+        deletion.delete()
+        transaction.on_commit(_changed)
+    return 0
+
+
+def purge_deleted(batch_size=DELETION_BATCH_SIZE):
+    """Удаляет все помеченные объекты пачками.
+
+    Отдаёт отметку об удалении после каждой пачки и ещё раз после
+    удаления самого объекта.
+    """
+    for deletion in PendingDeletion.objects.all():
+        while purge_batch(deletion, batch_size):
+            yield deletion
+        yield deletion
@@ -0,0 +1,184 @@
+"""Сводки новых постов для подписчиков.
+
+Новые посты - это pk после last_post_id прошлой рассылки. Подписки
+обходятся одним сгруппированным запросом (подписчик, автор, число новых
+постов), который читается пачками по ключу (user_id, author_id). Поэтому
+память не зависит от числа подписчиков, а каждая подписка читается один
+раз. Сводки и письма пишутся пачками.
+
+Запуск записывается в DigestRun до рассылки, и после каждой пачки в той же
+транзакции, что сводки и письма, сохраняется последний подписчик. Упавший
+запуск продолжается со следующего подписчика, а второй одновременный
+запуск не начинается: незавершённая строка DigestRun может быть только одна.
+"""
+import json
+from itertools import groupby, islice
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .authors import get_authors
+from .constants import (
+    DIGEST_BATCH_SIZE, DIGEST_FIRST_PERIOD_DAYS, DIGEST_RUN_TIMEOUT
+)
+from .deletion import hidden_ids
+from .models import Digest, DigestRun, Follow, PendingDeletion, Post, User
+
+DIGEST_SUBJECT = 'Новые посты ваших авторов'
+
+
+def follow_rows(
+    from_id, to_id, batch_size=DIGEST_BATCH_SIZE, after_user=0
+):
+    """(user_id, author_id, новых постов) по возрастанию ключа"""
+    rows = Follow.objects.filter(
+        author__posts__pk__gt=from_id,
+        author__posts__pk__lte=to_id,
+        user_id__gt=after_user,
+        user__is_active=True,
+    )
+    hidden = hidden_ids()[PendingDeletion.USER]
+    if hidden:
+        rows = rows.exclude(author_id__in=hidden)
+    rows = rows.values_list('user_id', 'author_id').annotate(
+        new_posts=Count('author__posts')
+    ).order_by('user_id', 'author_id')
+    last = None
+    while True:
+        batch = rows if last is None else rows.filter(
+            Q(user_id__gt=last[0]) | Q(user_id=last[0], author_id__gt=last[1])
+        )
+        batch = list(batch[:batch_size])
+        if not batch:
+            return
+        yield from batch
+        last = batch[-1]
+
+
+def build_digests(
+    from_id, to_id, batch_size=DIGEST_BATCH_SIZE, after_user=0
+):
+    """(user_id, [(author_id, новых постов), ...]) по одному подписчику"""
+    rows = follow_rows(from_id, to_id, batch_size, after_user)
+    for user_id, user_rows in groupby(rows, key=itemgetter(0)):
+        yield user_id, [(author, count) for _, author, count in user_rows]
+
+
+def deliver(digests):
+    """Сохраняет пачку сводок и отправляет письма одним вызовом"""
+    authors = get_authors(
+        author_id for _, items in digests for author_id, _ in items
+    )
+    emails = dict(
+        User.objects.filter(
+            pk__in=[user_id for user_id, _ in digests]
+        ).exclude(email='').values_list('pk', 'email')
+    )
+    created = []
+    messages = []
+    for user_id, items in digests:
+        entries = [
+            (authors[author_id].username, count)
+            for author_id, count in items if author_id in authors
+        ]
+        if not entries:
+            continue
+        post_count = sum(count for _, count in entries)
+        created.append(Digest(
+            user_id=user_id, post_count=post_count, items=json.dumps(entries)
+        ))
+        if user_id in emails:
+            messages.append(EmailMessage(
+                DIGEST_SUBJECT,
+                render_to_string(
+                    'posts/email/digest.txt',
+                    {
+                        'entries': entries,
+                        'post_count': post_count,
+                        'site_url': settings.SITE_URL,
+                    },
+                ),
+                to=[emails[user_id]],
+            ))
+    Digest.objects.bulk_create(created)
+    if messages:
+        get_connection().send_messages(messages)
+    return len(created)
+
+
+def first_post_id():
+    """Начало окна для самой первой рассылки"""
+    before = timezone.now() - timezone.timedelta(days=DIGEST_FIRST_PERIOD_DAYS)
+    return Post.objects.filter(pub_date__lt=before).aggregate(
+        last=Max('pk')
+    )['last'] or 0
+
+
+def start_run():
+    """Новый запуск или упавший прошлый; None, если рассылка уже идёт"""
+    now = timezone.now()
+    run = DigestRun.objects.filter(finished=False).first()
+    if run is not None:
+        if run.updated > now - timezone.timedelta(seconds=DIGEST_RUN_TIMEOUT):
+            return None
+        # из упавших запусков продолжает только один процесс
+        if not DigestRun.objects.filter(
+            pk=run.pk, updated=run.updated
+        ).update(updated=now):
+            return None
+        run.updated = now
+        return run
+    last_run = DigestRun.objects.filter(finished=True).first()
+    from_id = last_run.last_post_id if last_run else first_post_id()
+    to_id = Post.objects.aggregate(last=Max('pk'))['last'] or 0
+    if to_id <= from_id:
+        return None
+    try:
+        with transaction.atomic():
+            return DigestRun.objects.create(
+                from_post_id=from_id, last_post_id=to_id, updated=now
+            )
+    except IntegrityError:
+        return None
+
+
+def send_digests(batch_size=DIGEST_BATCH_SIZE):
+    """Рассылает сводки по постам после прошлого запуска.
+
+    Отдаёт число сводок после каждой пачки.
+    """
+    run = start_run()
+    if run is None:
+        return
+    digests = build_digests(
+        run.from_post_id, run.last_post_id, batch_size, run.last_user_id
+    )
+    total = run.digest_count
+    while True:
+        chunk = list(islice(digests, batch_size))
+        if not chunk:
+            break
+        with transaction.atomic():
+            count = deliver(chunk)
+            now = timezone.now()
+            # запуск перехватил другой процесс: пачку он разошлёт сам
+            if not DigestRun.objects.filter(
+                pk=run.pk, updated=run.updated
+            ).update(
+                last_user_id=chunk[-1][0],
+                digest_count=F('digest_count') + count,
+                updated=now,
+            ):
+                transaction.set_rollback(True)
+                return
+        run.updated = now
+        total += count
+        yield total
+    DigestRun.objects.filter(pk=run.pk, updated=run.updated).update(
+        finished=True
+    )
@@ -0,0 +1,46 @@
+from django.core.cache import cache
+
+from .authors import invalidate_counters
+from .models import Follow
+
+FOLLOWING_CACHE_KEY = 'following:{user_id}'
+FOLLOWING_CACHE_TIMEOUT = 60 * 60
+
+
+def following_ids(user):
+    """Множество id авторов, на которых подписан пользователь (из кэша)."""
+    if not user.is_authenticated:
+        return frozenset()
+    key = FOLLOWING_CACHE_KEY.format(user_id=user.pk)
+    ids = cache.get(key)
+    if ids is None:
+        ids = frozenset(
+            Follow.objects.filter(user=user).values_list(
+                'author_id', flat=True
+            )
+        )
+        cache.set(key, ids, FOLLOWING_CACHE_TIMEOUT)
+    return ids
+
+
+def invalidate(user_id):
+    cache.delete(FOLLOWING_CACHE_KEY.format(user_id=user_id))
+
+
+def follow_authors(user, author_ids):
+    """Подписывает пользователя сразу на нескольких авторов."""
+    author_ids = set(author_ids) - {user.pk}
+    Follow.objects.bulk_create(
+        [Follow(user=user, author_id=author_id) for author_id in author_ids],
+        ignore_conflicts=True,
+    )
+    invalidate(user.pk)
+    invalidate_counters(user.pk, *author_ids)
+
+
+def unfollow_authors(user, author_ids):
+    """Отписывает пользователя сразу от нескольких авторов.
+
+    Кэш подписок сбрасывает обработчик post_delete у Follow.
+    """
+    Follow.objects.filter(user=user, author_id__in=author_ids).delete()
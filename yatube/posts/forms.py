@@ -1,5 +1,7 @@
 from django import forms
+from django.conf import settings
 
+from .groups import all_groups
 from .models import Post, Comment
 
 
@@ -19,6 +21,24 @@ class PostForm(forms.ModelForm):
             'image': "Изображение к посту",
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # выпадающий список групп строим из реестра, без запроса к БД
+        self.fields['group'].choices = [('', '---------')] + [
+            (group.pk, str(group)) for group in all_groups()
+        ]
+
+    def clean_image(self):
+        """Отсекаем картинки-"бомбы" по заголовку, не декодируя их"""
+        image = self.cleaned_data.get('image')
+        pillow_image = getattr(image, 'image', None)
+        if pillow_image is not None and (
+            pillow_image.width * pillow_image.height
+            > settings.IMAGE_MAX_PIXELS
+        ):
+            raise forms.ValidationError('Слишком большое изображение')
+        return image
+
 
 class CommentForm(forms.ModelForm):
     """Класс для формы создания поста"""
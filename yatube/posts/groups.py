@@ -0,0 +1,81 @@
+"""Реестр групп в памяти воркера.
+
+Групп мало и меняются они редко, поэтому все они загружаются одним
+запросом и дальше ищутся по slug и id в словарях. Изменение группы
+увеличивает версию 'groups' в общем кэше, и каждый воркер перечитывает
+реестр при следующем обращении.
+"""
+import threading
+
+from core.cache import get_version
+from .deletion import hidden_ids
+from .models import Group, PendingDeletion
+
+VERSION_NAME = 'groups'
+
+_lock = threading.Lock()
+_registry = {'version': None, 'by_id': {}, 'by_slug': {}, 'ordered': []}
+
+
+def _current():
+    global _registry
+    version = get_version(VERSION_NAME)
+    registry = _registry
+    if registry['version'] == version:
+        return registry
+    with _lock:
+        groups = list(Group.objects.exclude(
+            pk__in=hidden_ids()[PendingDeletion.GROUP]
+        ).order_by('title'))
+        # новый словарь подменяется целиком, читатели без блокировок
+        # видят либо старый, либо новый реестр
+        _registry = registry = {
+            'version': version,
+            'by_id': {group.pk: group for group in groups},
+            'by_slug': {group.slug: group for group in groups},
+            'ordered': groups,
+        }
+    return registry
+
+
+def all_groups():
+    return _current()['ordered']
+
+
+def get_by_id(group_id, registry=None):
+    """Группа по id; если в реестре её нет, ищем в БД.
+
+    registry - уже прочитанный реестр, чтобы не сверять версию
+    с общим кэшем на каждую группу.
+    """
+    group = (registry or _current())['by_id'].get(group_id)
+    if group is None and group_id is not None:
+        group = Group.objects.filter(pk=group_id).first()
+    return group
+
+
+def get_by_slug(slug):
+    group = _current()['by_slug'].get(slug)
+    if group is None:
+        group = Group.objects.filter(slug=slug).exclude(
+            pk__in=hidden_ids()[PendingDeletion.GROUP]
+        ).first()
+    return group
+
+
+def attach_groups(posts):
+    """Подставляет группы из реестра, чтобы карточки не ходили в БД.
+
+    У постов удаляемой группы группа убирается, как после её удаления.
+    """
+    hidden = hidden_ids()[PendingDeletion.GROUP]
+    # версия реестра сверяется один раз на всю страницу
+    registry = _current()
+    for post in posts:
+        if post.group_id in hidden:
+            post.group = None
+        elif post.group_id is not None:
+            group = get_by_id(post.group_id, registry)
+            if group is not None:
+                post.group = group
+    return posts
@@ -0,0 +1,127 @@
+"""Лайки постов и комментариев.
+
+Лайк - строка PostLike/CommentLike с уникальной парой (пользователь,
+объект), поэтому повторный лайк ничего не меняет. Число лайков хранится
+в LIKE_SHARDS строках-шардах на объект: лайк увеличивает случайный шард,
+и одновременные лайки популярного поста не ждут блокировку одной строки.
+Итог - сумма шардов, он кэшируется. Для страницы состояние читается
+пачкой: один get_many к кэшу за числами и один запрос "что из этого
+лайкнул пользователь".
+"""
+import random
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Sum, Value, When
+
+from .constants import LIKE_SHARDS
+from .models import CommentLike, CommentLikeCounter, PostLike, PostLikeCounter
+
+POST = 'post'
+COMMENT = 'comment'
+# вид -> (модель лайка, модель шарда, поле объекта)
+KINDS = {
+    POST: (PostLike, PostLikeCounter, 'post_id'),
+    COMMENT: (CommentLike, CommentLikeCounter, 'comment_id'),
+}
+COUNT_KEY = 'likes:{}:{}'
+COUNT_TIMEOUT = 60 * 60
+
+
+def _add_to_shard(kind, object_id, delta):
+    _, counter, field = KINDS[kind]
+    shard = random.randrange(LIKE_SHARDS)
+    rows = counter.objects.filter(shard=shard, **{field: object_id})
+    if not rows.update(count=F('count') + delta):
+        counter.objects.bulk_create(
+            [counter(shard=shard, **{field: object_id})],
+            ignore_conflicts=True,
+        )
+        rows.update(count=F('count') + delta)
+
+
+def set_like(kind, user, object_id, liked):
+    """Ставит или снимает лайк; False, если он уже был в этом состоянии"""
+    like, _, field = KINDS[kind]
+    with transaction.atomic():
+        if liked:
+            try:
+                with transaction.atomic():
+                    like.objects.create(user=user, **{field: object_id})
+            except IntegrityError:
+                return False
+        elif not like.objects.filter(
+            user=user, **{field: object_id}
+        ).delete()[0]:
+            return False
+        _add_to_shard(kind, object_id, 1 if liked else -1)
+        transaction.on_commit(
+            lambda: cache.delete(COUNT_KEY.format(kind, object_id))
+        )
+    return True
+
+
+def get_counts(kind, ids):
+    """id -> число лайков: один запрос к кэшу и один к БД на промахи"""
+    ids = set(ids)
+    keys = {COUNT_KEY.format(kind, pk): pk for pk in ids}
+    counts = {
+        keys[key]: count for key, count in cache.get_many(keys).items()
+    }
+    missing = ids - set(counts)
+    if missing:
+        loaded = load_counts(kind, missing)
+        cache.set_many(
+            {COUNT_KEY.format(kind, pk): n for pk, n in loaded.items()},
+            COUNT_TIMEOUT,
+        )
+        counts.update(loaded)
+    return counts
+
+
+def load_counts(kind, ids):
+    """id -> число лайков: сумма шардов из БД, мимо кэша"""
+    _, counter, field = KINDS[kind]
+    counts = dict.fromkeys(ids, 0)
+    counts.update(
+        counter.objects.filter(**{f'{field}__in': ids}).values_list(
+            field
+        ).annotate(total=Sum('count')).order_by()
+    )
+    return counts
+
+
+def liked_ids(kind, user, ids):
+    """Какие из ids лайкнул пользователь, одним запросом"""
+    if not user.is_authenticated or not ids:
+        return set()
+    like, _, field = KINDS[kind]
+    return set(
+        like.objects.filter(
+            user=user, **{f'{field}__in': ids}
+        ).values_list(field, flat=True)
+    )
+
+
+def forget_likes(rows):
+    """Вычитает из счётчиков пачку лайков перед их удалением"""
+    kind = next(k for k, (like, _, _) in KINDS.items() if like is rows.model)
+    _, counter, field = KINDS[kind]
+    counts = Counter(rows.values_list(field, flat=True))
+    if not counts:
+        return
+    # всё вычитается из нулевого шарда одним UPDATE
+    counter.objects.bulk_create(
+        [counter(shard=0, **{field: pk}) for pk in counts],
+        ignore_conflicts=True,
+    )
+    counter.objects.filter(
+        shard=0, **{f'{field}__in': list(counts)}
+    ).update(count=F('count') - Case(
+        *[When(**{field: pk}, then=Value(n)) for pk, n in counts.items()],
+        default=Value(0),
+    ))
+    transaction.on_commit(lambda: cache.delete_many(
+        [COUNT_KEY.format(kind, pk) for pk in counts]
+    ))
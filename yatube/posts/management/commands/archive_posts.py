@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts.archive import archive_posts
+
+
+class Command(BaseCommand):
+    help = 'Переносит старые посты и их комментарии в архивные таблицы'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days',
+            type=int,
+            default=365,
+            help='Архивировать посты старше стольких дней',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько постов переносить за одну транзакцию',
+        )
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timezone.timedelta(
+            days=options['older_than_days']
+        )
+        total = 0
+        for moved in archive_posts(before, options['batch_size']):
+            total += moved
+            self.stdout.write(f'Перенесено постов: {total}')
+        self.stdout.write(f'Готово, всего в архив: {total}')
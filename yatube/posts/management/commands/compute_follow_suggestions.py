@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from posts.constants import SUGGESTION_BATCH_SIZE, SUGGESTIONS_COUNT
+from posts.suggestions import compute_suggestions
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рекомендации "на кого подписаться"'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top-k',
+            type=int,
+            default=SUGGESTIONS_COUNT,
+            help='Сколько рекомендаций хранить на пользователя',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=SUGGESTION_BATCH_SIZE,
+            help='Сколько пользователей пересчитывать в одной транзакции',
+        )
+
+    def handle(self, *args, **options):
+        count = compute_suggestions(
+            top_k=options['top_k'], batch_size=options['batch_size']
+        )
+        self.stdout.write(f'Записано рекомендаций: {count}')
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from posts.constants import DELETION_BATCH_SIZE
+from posts.deletion import purge_deleted
+
+
+class Command(BaseCommand):
+    help = 'Удаляет помеченных пользователей и группы небольшими пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DELETION_BATCH_SIZE,
+            help='Сколько строк удалять за одну транзакцию',
+        )
+
+    def handle(self, *args, **options):
+        for deletion in purge_deleted(options['batch_size']):
+            if deletion.pk is None:
+                self.stdout.write(
+                    f'{deletion}: удалено, строк {deletion.purged}'
+                )
+            else:
+                self.stdout.write(
+                    f'{deletion}: обработано строк {deletion.purged}'
+                )
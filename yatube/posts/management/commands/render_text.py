@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from posts.constants import RENDER_BATCH_SIZE
+from posts.rendering import RENDERED_MODELS, render_batches
+
+
+class Command(BaseCommand):
+    help = 'Заполняет отрендеренный HTML постов и комментариев пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=RENDER_BATCH_SIZE,
+            help='Сколько строк обновлять за один запрос',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            dest='everything',
+            help='Перерисовать и уже заполненные строки',
+        )
+
+    def handle(self, *args, **options):
+        for model in RENDERED_MODELS:
+            name = model._meta.verbose_name_plural
+            total = 0
+            for updated in render_batches(
+                model, options['batch_size'], options['everything']
+            ):
+                total += updated
+                self.stdout.write(f'{name}: обновлено {total}')
+            self.stdout.write(f'{name}: готово, всего {total}')
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from posts.constants import DIGEST_BATCH_SIZE
+from posts.digests import send_digests
+
+
+class Command(BaseCommand):
+    help = 'Рассылает подписчикам сводки новых постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DIGEST_BATCH_SIZE,
+            help='Сколько сводок собирать и отправлять за раз',
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        for total in send_digests(options['batch_size']):
+            self.stdout.write(f'Сводок: {total}')
+        self.stdout.write(f'Готово, всего сводок: {total}')
@@ -0,0 +1,35 @@
+# Generated by Django 2.2.16 on 2026-10-19 07:31
+
+from django.db import migrations, models
+
+
+def fill_group_counters(apps, schema_editor):
+    Group = apps.get_model('posts', 'Group')
+    for group in Group.objects.annotate(
+        posts_total=models.Count('posts'),
+        last_post=models.Max('posts__pub_date'),
+    ):
+        group.post_count = group.posts_total
+        group.last_post_at = group.last_post
+        group.save(update_fields=('post_count', 'last_post_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_followsuggestion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='last_post_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Last post in group'),
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Posts in group'),
+        ),
+        migrations.RunPython(fill_group_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.16 on 2026-10-19 07:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_rendered_text'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingDeletion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('user', 'Пользователь'), ('group', 'Группа')], max_length=5)),
+                ('object_id', models.IntegerField()),
+                ('title', models.CharField(max_length=200)),
+                ('purged', models.PositiveIntegerField(default=0)),
+                ('requested_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ('requested_at',),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='pendingdeletion',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='unique pending deletion'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 2.2.16 on 2026-10-19 08:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_digests'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='view_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='PostViewHour',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='view_hours', to='posts.Post')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='postviewhour',
+            constraint=models.UniqueConstraint(fields=('post', 'hour'), name='unique post view hour'),
+        ),
+    ]
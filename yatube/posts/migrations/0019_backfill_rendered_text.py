@@ -0,0 +1,52 @@
+from django.db import migrations
+from django.utils.html import linebreaks
+from django.utils.text import Truncator
+
+BATCH_SIZE = 500
+# копия posts.rendering на момент миграции: живой модуль может измениться
+EXCERPT_LENGTH = 300
+
+
+def render_text(text):
+    return linebreaks(text, autoescape=True)
+
+
+def render_excerpt(text):
+    return render_text(Truncator(text).chars(EXCERPT_LENGTH))
+
+
+def backfill(apps, schema_editor):
+    """Списки откладывают text и показывают только excerpt_html,
+    поэтому HTML должен быть у всех строк, а не только у новых."""
+    for name, fields in (
+        ('Post', ('text_html', 'excerpt_html')),
+        ('ArchivedPost', ('text_html', 'excerpt_html')),
+        ('Comment', ('text_html',)),
+        ('ArchivedComment', ('text_html',)),
+    ):
+        model = apps.get_model('posts', name)
+        rows = model.objects.filter(text_html='').order_by('pk').only(
+            'pk', 'text'
+        )
+        last_pk = 0
+        while True:
+            batch = list(rows.filter(pk__gt=last_pk)[:BATCH_SIZE])
+            if not batch:
+                break
+            for row in batch:
+                row.text_html = render_text(row.text)
+                if 'excerpt_html' in fields:
+                    row.excerpt_html = render_excerpt(row.text)
+            model.objects.bulk_update(batch, fields)
+            last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_likes'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
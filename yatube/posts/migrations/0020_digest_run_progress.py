@@ -0,0 +1,48 @@
+# Generated by Django 2.2.16 on 2026-10-19 12:10
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_backfill_rendered_text'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='digestrun',
+            name='from_post_id',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='digestrun',
+            name='last_user_id',
+            field=models.IntegerField(default=0),
+        ),
+        # прежние запуски записывались только после окончания рассылки
+        migrations.AddField(
+            model_name='digestrun',
+            name='finished',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AlterField(
+            model_name='digestrun',
+            name='finished',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='digestrun',
+            name='updated',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddConstraint(
+            model_name='digestrun',
+            constraint=models.UniqueConstraint(
+                condition=models.Q(finished=False),
+                fields=('finished',),
+                name='single_running_digest_run',
+            ),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 
 from posts.constants import TEXT_BACK_LIMIT
@@ -11,6 +12,17 @@ class Group(models.Model):
     title = models.CharField(max_length=200, verbose_name='Title in group')
     slug = models.SlugField(unique=True, verbose_name='Slug in group')
     description = models.TextField(verbose_name='Description group')
+    post_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Posts in group',
+    )
+    last_post_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        editable=False,
+        verbose_name='Last post in group',
+    )
 
     def __str__(self) -> str:
         return self.title
@@ -46,6 +58,9 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    text_html = models.TextField(blank=True, editable=False)
+    excerpt_html = models.TextField(blank=True, editable=False)
+    view_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ('-pub_date',)
@@ -71,6 +86,7 @@ class Comment(models.Model):
         verbose_name='text',
         help_text='Введите текст комментария',
     )
+    text_html = models.TextField(blank=True, editable=False)
     created = models.DateTimeField(
         auto_now_add=True,
         verbose_name='created_date'
@@ -95,9 +111,280 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         related_name='following',
     )
-    constraints = [
-        models.UniqueConstraint(
-            fields=['user', 'author'],
-            name='unique follow'
-        )
-    ]
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique follow'
+            )
+        ]
+
+
+class FollowSuggestion(models.Model):
+    """Рекомендация автора для подписки, считается офлайн"""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='follow_suggestions',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='suggested_to',
+    )
+    score = models.FloatField(verbose_name='score')
+
+    class Meta:
+        ordering = ('-score',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique follow suggestion'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['user', '-score']),
+        ]
+
+
+class ArchivedPost(models.Model):
+    """Старый пост, перенесённый из горячей таблицы, id сохраняется"""
+    id = models.IntegerField(primary_key=True)
+    text = models.TextField(verbose_name='text')
+    pub_date = models.DateTimeField(verbose_name='pub_date')
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_posts',
+        verbose_name='author',
+    )
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.SET_NULL,
+        related_name='archived_posts',
+        blank=True,
+        null=True,
+        verbose_name='group',
+    )
+    image = models.ImageField('Картинка', upload_to='posts/', blank=True)
+    text_html = models.TextField(blank=True, editable=False)
+    excerpt_html = models.TextField(blank=True, editable=False)
+    # лайки и просмотры горячего поста на момент переноса
+    view_count = models.PositiveIntegerField(default=0, editable=False)
+    like_count = models.PositiveIntegerField(default=0, editable=False)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ('-pub_date',)
+        indexes = [
+            models.Index(fields=['author', '-pub_date']),
+        ]
+
+    def __str__(self):
+        return self.text[:TEXT_BACK_LIMIT]
+
+
+class ArchivedComment(models.Model):
+    """Комментарий к архивному посту"""
+    id = models.IntegerField(primary_key=True)
+    post = models.ForeignKey(
+        ArchivedPost,
+        related_name='comments',
+        on_delete=models.CASCADE,
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_comments',
+        verbose_name='author',
+    )
+    text = models.TextField(verbose_name='text')
+    text_html = models.TextField(blank=True, editable=False)
+    created = models.DateTimeField(verbose_name='created_date')
+    like_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        ordering = ('-created',)
+
+    def __str__(self) -> str:
+        return self.text
+
+
+class PendingDeletion(models.Model):
+    """Пользователь или группа, которые удаляются фоном пачками"""
+    USER = 'user'
+    GROUP = 'group'
+    KIND_CHOICES = (
+        (USER, 'Пользователь'),
+        (GROUP, 'Группа'),
+    )
+    kind = models.CharField(max_length=5, choices=KIND_CHOICES)
+    object_id = models.IntegerField()
+    title = models.CharField(max_length=200)
+    purged = models.PositiveIntegerField(default=0)
+    requested_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ('requested_at',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'object_id'],
+                name='unique pending deletion'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.get_kind_display()} {self.title}'
+
+
+class Digest(models.Model):
+    """Сводка новых постов авторов, на которых подписан пользователь"""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='digests',
+    )
+    post_count = models.PositiveIntegerField()
+    # JSON: [[имя автора, число новых постов], ...]
+    items = models.TextField()
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ('-created',)
+        indexes = [
+            models.Index(fields=['user', '-created']),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.user_id}: {self.post_count}'
+
+
+class DigestRun(models.Model):
+    """Запуск рассылки сводок по постам (from_post_id, last_post_id].
+
+    Незавершённый запуск может быть только один; сводки подписчикам
+    до last_user_id включительно уже разосланы.
+    """
+    from_post_id = models.IntegerField(default=0)
+    last_post_id = models.IntegerField()
+    last_user_id = models.IntegerField(default=0)
+    digest_count = models.PositiveIntegerField(default=0)
+    finished = models.BooleanField(default=False)
+    created = models.DateTimeField(auto_now_add=True)
+    # обновляется после каждой пачки, давно не обновлённый запуск упал
+    updated = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ('-created',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['finished'],
+                condition=models.Q(finished=False),
+                name='single_running_digest_run',
+            ),
+        ]
+
+
+class PostViewHour(models.Model):
+    """Просмотры поста за час, см. posts.counters"""
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='view_hours',
+    )
+    hour = models.DateTimeField()
+    views = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['post', 'hour'],
+                name='unique post view hour'
+            )
+        ]
+
+
+class PostLike(models.Model):
+    """Лайк поста, см. posts.likes"""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='post_likes',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='likes',
+    )
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique post like'
+            )
+        ]
+
+
+class CommentLike(models.Model):
+    """Лайк комментария, см. posts.likes"""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='comment_likes',
+    )
+    comment = models.ForeignKey(
+        Comment,
+        on_delete=models.CASCADE,
+        related_name='likes',
+    )
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'comment'],
+                name='unique comment like'
+            )
+        ]
+
+
+class PostLikeCounter(models.Model):
+    """Шард счётчика лайков поста: число лайков - сумма шардов"""
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='like_counters',
+    )
+    shard = models.PositiveSmallIntegerField()
+    # шард может уйти в минус: лайк снимается со случайного шарда
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['post', 'shard'],
+                name='unique post like shard'
+            )
+        ]
+
+
+class CommentLikeCounter(models.Model):
+    """Шард счётчика лайков комментария"""
+    comment = models.ForeignKey(
+        Comment,
+        on_delete=models.CASCADE,
+        related_name='like_counters',
+    )
+    shard = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['comment', 'shard'],
+                name='unique comment like shard'
+            )
+        ]
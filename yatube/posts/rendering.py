@@ -0,0 +1,58 @@
+"""Заранее отрендеренный HTML текстов постов и комментариев.
+
+linebreaks на каждом показе заметен для длинных постов, поэтому HTML
+считается один раз при сохранении. Текст экранируется, так что в поле
+попадает только разметка абзацев.
+"""
+from django.utils.html import linebreaks
+from django.utils.text import Truncator
+
+from .constants import EXCERPT_LENGTH, RENDER_BATCH_SIZE
+from .models import ArchivedComment, ArchivedPost, Comment, Post
+
+# модели с отрендеренным текстом и поля, которые для них считаются
+RENDERED_MODELS = {
+    Post: ('text_html', 'excerpt_html'),
+    Comment: ('text_html',),
+    ArchivedPost: ('text_html', 'excerpt_html'),
+    ArchivedComment: ('text_html',),
+}
+
+
+def render_text(text):
+    return linebreaks(text, autoescape=True)
+
+
+def render_excerpt(text):
+    return render_text(Truncator(text).chars(EXCERPT_LENGTH))
+
+
+RENDERERS = {'text_html': render_text, 'excerpt_html': render_excerpt}
+
+
+def render_fields(instance):
+    """Заполняет HTML-поля объекта по его тексту."""
+    for field in RENDERED_MODELS[type(instance)]:
+        setattr(instance, field, RENDERERS[field](instance.text))
+
+
+def render_batches(model, batch_size=RENDER_BATCH_SIZE, everything=False):
+    """Заполняет HTML пачками по возрастанию pk, отдаёт число обновлённых.
+
+    Без everything трогает только ещё не отрендеренные строки.
+    """
+    fields = RENDERED_MODELS[model]
+    rows = model.objects.order_by('pk').only('pk', 'text')
+    if not everything:
+        rows = rows.filter(text_html='').exclude(text='')
+    last_pk = None
+    while True:
+        batch = rows if last_pk is None else rows.filter(pk__gt=last_pk)
+        batch = list(batch[:batch_size])
+        if not batch:
+            return
+        for instance in batch:
+            render_fields(instance)
+        model.objects.bulk_update(batch, fields)
+        last_pk = batch[-1].pk
+        yield len(batch)
@@ -0,0 +1,141 @@
+from django.core.files import File
+from django.db import transaction
+from django.db.models import DEFERRED, F, Max
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.signals import (
+    post_delete,
+    post_init,
+    post_save,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from core import pubsub
+from core.cache import bump_version
+from core.storage import release
+from .authors import invalidate_counters, invalidate_user
+from .follow_graph import invalidate as invalidate_following
+from .models import ArchivedPost, Comment, Follow, Group, Post, User
+from .rendering import render_fields
+
+
+def add_to_group(group_id, pub_date):
+    Group.objects.filter(pk=group_id).update(
+        post_count=F('post_count') + 1,
+        last_post_at=Greatest(Coalesce('last_post_at', pub_date), pub_date),
+    )
+
+
+def remove_from_group(group_id):
+    """Уменьшает счётчик и пересчитывает дату последнего поста группы"""
+    Group.objects.filter(pk=group_id).update(
+        post_count=Greatest(F('post_count') - 1, 0),
+        last_post_at=Post.objects.filter(group_id=group_id).aggregate(
+            last=Max('pub_date')
+        )['last'],
+    )
+
+
+@receiver(pre_save, sender=Post)
+@receiver(pre_save, sender=Comment)
+def render_text_html(sender, instance, update_fields=None, **kwargs):
+    """HTML текста считается при сохранении, а не на каждом показе"""
+    if update_fields is None or 'text' in update_fields:
+        render_fields(instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_upload(sender, instance, **kwargs):
+    # новый файл запишется при сохранении и получит свою ссылку, даже
+    # если его содержимое и имя совпадут со старым; только из __dict__,
+    # чтобы не догружать отложенное поле
+    image = instance.__dict__.get('image')
+    instance._image_uploaded = isinstance(image, File) and not getattr(
+        image, '_committed', False
+    )
+
+
+@receiver(post_init, sender=Post)
+def remember_loaded_values(sender, instance, **kwargs):
+    # только из __dict__: обращение к отложенному полю догружает его
+    # новым экземпляром и снова вызывает post_init
+    data = instance.__dict__
+    instance._loaded_group_id = data.get('group_id', DEFERRED)
+    image = data.get('image', DEFERRED)
+    instance._loaded_image = getattr(image, 'name', image)
+
+
+@receiver(post_save, sender=Post)
+def update_group_on_save(sender, instance, created, **kwargs):
+    old_group_id = None if created else instance._loaded_group_id
+    if old_group_id is not DEFERRED and old_group_id != instance.group_id:
+        if old_group_id is not None:
+            remove_from_group(old_group_id)
+        if instance.group_id is not None:
+            add_to_group(instance.group_id, instance.pub_date)
+    instance._loaded_group_id = instance.group_id
+    replaced = (
+        instance._image_uploaded
+        or instance._loaded_image != instance.image.name
+    )
+    if not created and instance._loaded_image is not DEFERRED and replaced:
+        release(instance._loaded_image)
+    instance._loaded_image = instance.image.name
+    if created:
+        invalidate_counters(instance.author_id)
+    bump_version('posts')
+
+
+@receiver(post_delete, sender=Post)
+def update_group_on_delete(sender, instance, **kwargs):
+    if instance.group_id is not None:
+        remove_from_group(instance.group_id)
+    release(instance.image.name)
+    invalidate_counters(instance.author_id)
+    bump_version('posts')
+
+
+@receiver(post_delete, sender=ArchivedPost)
+def release_archived_image(sender, instance, **kwargs):
+    release(instance.image.name)
+
+
+def comments_channel(post_id):
+    return f'comments:{post_id}'
+
+
+@receiver(post_save, sender=Comment)
+def publish_comment(sender, instance, created, **kwargs):
+    if created:
+        channel = comments_channel(instance.post_id)
+        transaction.on_commit(lambda: pubsub.publish(channel))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def reload_groups(sender, **kwargs):
+    bump_version('groups')
+
+
+@receiver(post_init, sender=User)
+def remember_username(sender, instance, **kwargs):
+    instance._loaded_username = instance.__dict__.get('username')
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def reload_author(sender, instance, **kwargs):
+    """Сбрасывает кэш автора, старое и новое имя (и отрицательный кэш)"""
+    invalidate_user(
+        instance.pk, instance._loaded_username, instance.username
+    )
+    instance._loaded_username = instance.username
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def reset_follow_cache(sender, instance, **kwargs):
+    """Подписки меняются не только через follow_graph: в админке,
+    каскадом и при фоновом удалении"""
+    invalidate_following(instance.user_id)
+    invalidate_counters(instance.user_id, instance.author_id)
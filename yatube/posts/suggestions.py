@@ -0,0 +1,96 @@
+import heapq
+from collections import Counter, defaultdict
+
+from django.db import transaction
+
+from .constants import (
+    SUGGESTION_BATCH_SIZE,
+    SUGGESTIONS_COUNT,
+    SUGGESTION_FRIEND_WEIGHT,
+    SUGGESTION_GROUP_WEIGHT,
+)
+from .models import Follow, FollowSuggestion, Post
+
+
+def load_follow_graph():
+    """Списки смежности: пользователь -> множество его авторов."""
+    graph = defaultdict(set)
+    for user_id, author_id in Follow.objects.values_list(
+        'user_id', 'author_id'
+    ).iterator():
+        graph[user_id].add(author_id)
+    return graph
+
+
+def load_group_members():
+    """Группа -> авторы, писавшие в неё, и автор -> его группы."""
+    members = defaultdict(set)
+    user_groups = defaultdict(set)
+    for author_id, group_id in Post.objects.filter(
+        group__isnull=False
+    ).values_list('author_id', 'group_id').distinct().iterator():
+        members[group_id].add(author_id)
+        user_groups[author_id].add(group_id)
+    return members, user_groups
+
+
+def score_user(user_id, graph, members, user_groups):
+    """Баллы кандидатов: друзья друзей и соавторы по группам."""
+    scores = Counter()
+    following = graph.get(user_id, set())
+    for friend_id in following:
+        for candidate_id in graph.get(friend_id, ()):
+            scores[candidate_id] += SUGGESTION_FRIEND_WEIGHT
+    for group_id in user_groups.get(user_id, ()):
+        for candidate_id in members[group_id]:
+            scores[candidate_id] += SUGGESTION_GROUP_WEIGHT
+    scores.pop(user_id, None)
+    for author_id in following:
+        scores.pop(author_id, None)
+    return scores
+
+
+def write_batch(user_ids, suggestions, after):
+    """Заменяет рекомендации пользователей с id из (after, user_ids[-1]].
+
+    Короткая транзакция на пачку: при SQLite остальные записи ждут
+    только её, а не пересчёт всей таблицы.
+    """
+    with transaction.atomic():
+        FollowSuggestion.objects.filter(
+            user_id__gt=after, user_id__lte=user_ids[-1]
+        ).delete()
+        FollowSuggestion.objects.bulk_create(suggestions)
+
+
+def compute_suggestions(top_k=SUGGESTIONS_COUNT,
+                        batch_size=SUGGESTION_BATCH_SIZE):
+    """Пересчитывает рекомендации для всех пользователей пачками.
+
+    Возвращает число записанных рекомендаций.
+    """
+    graph = load_follow_graph()
+    members, user_groups = load_group_members()
+    user_ids = sorted(set(graph) | set(user_groups))
+    total = 0
+    after = 0
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start:start + batch_size]
+        suggestions = []
+        for user_id in batch:
+            scores = score_user(user_id, graph, members, user_groups)
+            top = heapq.nlargest(
+                top_k, scores.items(), key=lambda item: (item[1], -item[0])
+            )
+            suggestions.extend(
+                FollowSuggestion(
+                    user_id=user_id, author_id=author_id, score=score
+                )
+                for author_id, score in top
+            )
+        write_batch(batch, suggestions, after)
+        total += len(suggestions)
+        after = batch[-1]
+    # у оставшихся пользователей кандидатов больше нет
+    FollowSuggestion.objects.filter(user_id__gt=after).delete()
+    return total
@@ -0,0 +1,17 @@
+from core.images import optimize_image
+from core.jobs import task
+from .digests import send_digests
+from .models import Post
+
+
+@task(queue='images')
+def optimize_post_image(post_id: int, name: str):
+    """Уменьшает картинку поста и убирает из неё EXIF"""
+    optimize_image(Post, post_id, 'image', name)
+
+
+@task
+def send_follow_digests():
+    """Сводки новых постов подписчикам, запускается по расписанию"""
+    for _ in send_digests():
+        pass
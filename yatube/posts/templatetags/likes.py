@@ -0,0 +1,25 @@
+from django import template
+
+from posts.likes import get_counts, liked_ids
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def like_state(context, kind, object_id, page_ids):
+    """{'count': лайков, 'liked': лайкнул ли пользователь} для объекта.
+
+    При первом вызове за запрос состояние загружается сразу для всех
+    объектов страницы (page_ids), остальные вызовы берут его из запроса.
+    """
+    request = context['request']
+    states = request.__dict__.setdefault('like_states', {})
+    if (kind, object_id) not in states:
+        ids = set(page_ids) | {object_id}
+        counts = get_counts(kind, ids)
+        liked = liked_ids(kind, request.user, ids)
+        states.update({
+            (kind, pk): {'count': counts[pk], 'liked': pk in liked}
+            for pk in ids
+        })
+    return states[(kind, object_id)]
@@ -1,17 +1,31 @@
+import hashlib
+import os
 import shutil
 import tempfile
 from http import HTTPStatus
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.db import DatabaseError, transaction
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings
+)
 from django.urls import reverse
 
+from sorl.thumbnail import get_thumbnail
+
+from core.models import StoredFile
 from posts.models import User, Post, Group, Comment
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
+def stored_image_name(content, extension):
+    """Имя, под которым хранилище сохранит файл с таким содержимым"""
+    digest = hashlib.sha256(content).hexdigest()
+    return f'posts/{digest[:2]}/{digest}{extension}'
+
+
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class PostCreateFormTests(TestCase):
     @classmethod
@@ -68,10 +82,33 @@ class PostCreateFormTests(TestCase):
         self.assertEqual(objects_after_create.group.pk, form_data['group'])
         self.assertEqual(
             objects_after_create.image,
-            f'posts/{form_data["image"].name}'
+            stored_image_name(image_bytes_literals, '.jpeg')
         )
         self.assertEqual(objects_after_create.author, self.user)
 
+    @override_settings(IMAGE_MAX_PIXELS=1)
+    def test_create_post_rejects_huge_image(self):
+        """Картинка больше лимита пикселей не принимается"""
+        uploaded = SimpleUploadedFile(
+            name='huge.gif',
+            content=(
+                b'\x47\x49\x46\x38\x39\x61\x02\x00'
+                b'\x01\x00\x80\x00\x00\x00\x00\x00'
+                b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+                b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+                b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+                b'\x0A\x00\x3B'
+            ),
+            content_type='image/gif'
+        )
+        response = self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Тестовый текст', 'image': uploaded},
+        )
+        self.assertFormError(
+            response, 'form', 'image', 'Слишком большое изображение'
+        )
+
     def test_edit_post(self):
         """Проверка изменения поста"""
         post = Post.objects.create(
@@ -108,7 +145,9 @@ class PostCreateFormTests(TestCase):
                         author=PostCreateFormTests.user,
                         group=form_data['group'],
                         id=post.pk,
-                        image=f'posts/{form_data["image"].name}'
+                        image=stored_image_name(
+                            image_bytes_literals, '.jpeg'
+                        )
                         ), error_name_one)
 
     def test_create_comment_authorized_user(self):
@@ -153,3 +192,105 @@ class PostCreateFormTests(TestCase):
         )
         after_create = set(Comment.objects.all())
         self.assertEqual(len(after_create - before_create), 0)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedImageTests(TransactionTestCase):
+    # файлы удаляются после коммита, нужны настоящие транзакции
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='DimaB')
+
+    def test_same_image_stored_once(self):
+        """Одинаковые картинки хранятся один раз и удаляются
+        вместе с последним постом"""
+        content = b'GIF89a' + b'\x00' * 32
+        posts = [
+            Post.objects.create(
+                author=self.user,
+                text=f'Пост {i}',
+                image=SimpleUploadedFile(f'copy{i}.gif', content),
+            )
+            for i in range(2)
+        ]
+        name = stored_image_name(content, '.gif')
+        self.assertEqual({post.image.name for post in posts}, {name})
+        path = os.path.join(TEMP_MEDIA_ROOT, name)
+        posts[0].delete()
+        self.assertTrue(os.path.exists(path))
+        posts[1].delete()
+        self.assertFalse(os.path.exists(path))
+
+    def test_file_kept_on_rollback(self):
+        """Откат удаления поста не теряет файл"""
+        content = b'GIF89a' + b'\x01' * 32
+        post = Post.objects.create(
+            author=self.user,
+            text='Пост',
+            image=SimpleUploadedFile('kept.gif', content),
+        )
+        path = os.path.join(TEMP_MEDIA_ROOT, post.image.name)
+        with self.assertRaises(DatabaseError):
+            with transaction.atomic():
+                Post.objects.filter(pk=post.pk).delete()
+                raise DatabaseError
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(
+            StoredFile.objects.get(name=post.image.name).ref_count, 1
+        )
+
+    def test_same_image_reuploaded(self):
+        """Повторная загрузка того же файла не добавляет ссылку"""
+        content = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00\x01\x00\x80\x00'
+            b'\x00\x00\x00\x00\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00\x02\x00\x01\x00'
+            b'\x00\x02\x02\x0C\x0A\x00\x3B'
+        )
+        post = Post.objects.create(
+            author=self.user,
+            text='Пост',
+            image=SimpleUploadedFile('first.gif', content),
+        )
+        client = Client()
+        client.force_login(self.user)
+        for name in ('again.gif', 'once_more.gif'):
+            response = client.post(
+                reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+                data={
+                    'text': 'Пост',
+                    'image': SimpleUploadedFile(name, content),
+                },
+            )
+            self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        self.assertEqual(
+            StoredFile.objects.get(name=post.image.name).ref_count, 1
+        )
+        post.refresh_from_db()
+        post.delete()
+        self.assertFalse(StoredFile.objects.exists())
+
+    def test_thumbnails_not_counted(self):
+        """Миниатюры не попадают в счётчик ссылок загрузок"""
+        content = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00\x01\x00\x80\x00'
+            b'\x00\x00\x00\x00\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00\x02\x00\x01\x00'
+            b'\x00\x02\x02\x0C\x0A\x00\x3B'
+        )
+        post = Post.objects.create(
+            author=self.user,
+            text='Пост с миниатюрой',
+            image=SimpleUploadedFile('small.gif', content),
+        )
+        for _ in range(3):
+            get_thumbnail(post.image, '960x339', crop='center')
+        self.assertEqual(
+            list(StoredFile.objects.values_list('name', 'ref_count')),
+            [(post.image.name, 1)],
+        )
@@ -1,15 +1,36 @@
+import json
+from importlib import import_module
+from http import HTTPStatus
+from io import StringIO
 import shutil
 import tempfile
 
+from django.apps import apps
 from django.conf import settings
+from django.core import mail
 from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 
-from ..models import User, Post, Group, Comment, Follow
-from ..constants import POSTS_PER_PAGE, POSTS_FOR_BULK_CREATE
+from ..models import (
+    ArchivedComment, ArchivedPost, User, Post, Group, Comment, Follow,
+    FollowSuggestion, PendingDeletion, Digest, DigestRun, PostViewHour,
+    PostLike, PostLikeCounter,
+)
+from ..constants import (
+    FEED_SINCE_LIMIT, POSTS_PER_PAGE, POSTS_FOR_BULK_CREATE,
+    VIEW_UPDATE_CHUNK,
+)
+from .. import counters, groups, likes
+from ..deletion import request_deletion
+from ..digests import send_digests
+from ..follow_graph import follow_authors, following_ids
 from ..forms import CommentForm, PostForm
+from ..utils import page_window
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -196,6 +217,46 @@ class ViewsTest(TestCase):
             post_two.pk,
             'Пост найден в некорректной группе')
 
+    def test_group_index_counters(self):
+        """Каталог групп показывает счётчик постов и обновляет его"""
+        response = self.client.get(reverse('posts:group_index'))
+        groups = {group.pk: group for group in response.context['page_obj']}
+        self.assertEqual(groups[self.group.pk].post_count, 1)
+        self.assertEqual(groups[self.group_2.pk].post_count, 0)
+        post = Post.objects.create(
+            author=self.user, text='Новый пост', group=self.group_2
+        )
+        post.group = self.group
+        post.save()
+        self.group.refresh_from_db()
+        self.group_2.refresh_from_db()
+        self.assertEqual(self.group.post_count, 2)
+        self.assertEqual(self.group.last_post_at, post.pub_date)
+        self.assertEqual(self.group_2.post_count, 0)
+        self.assertIsNone(self.group_2.last_post_at)
+        post.delete()
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.post_count, 1)
+        self.assertEqual(self.group.last_post_at, self.post.pub_date)
+
+    def test_group_registry(self):
+        """Группы берутся из реестра и обновляются после изменения"""
+        groups.get_by_slug(self.group.slug)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                groups.get_by_slug(self.group.slug).title, self.group.title
+            )
+            self.assertEqual(
+                groups.get_by_id(self.group_2.pk).slug, self.group_2.slug
+            )
+        self.group.title = 'Новое название'
+        self.group.save()
+        self.assertEqual(
+            groups.get_by_slug(self.group.slug).title, 'Новое название'
+        )
+        self.group.title = 'tests_group'
+        self.group.save()
+
     def test_follow(self):
         """Авторизованный пользователь может подписываться
         на других пользователей"""
@@ -226,6 +287,152 @@ class ViewsTest(TestCase):
             user=self.user_2, author=self.user
         ).exists(), error_one)
 
+    def test_follow_bulk(self):
+        """Пакетная подписка и отписка через JSON"""
+        response = self.authorized_client_two.post(
+            reverse('posts:follow_bulk'),
+            data=json.dumps({'follow': [self.user.username, 'nobody']}),
+            content_type='application/json',
+        )
+        self.assertEqual(
+            response.json(), {'following': [self.user.username]}
+        )
+        self.assertTrue(Follow.objects.filter(
+            user=self.user_2, author=self.user
+        ).exists())
+        response = self.authorized_client_two.post(
+            reverse('posts:follow_bulk'),
+            data=json.dumps({'unfollow': [self.user.username]}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.json(), {'following': []})
+        self.assertFalse(Follow.objects.filter(
+            user=self.user_2, author=self.user
+        ).exists())
+        for data in ({'follow': self.user.username}, {'unfollow': [1]}):
+            response = self.authorized_client_two.post(
+                reverse('posts:follow_bulk'),
+                data=json.dumps(data),
+                content_type='application/json',
+            )
+            self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_following_cache_after_cascade(self):
+        """Подписка, удалённая каскадом, пропадает из кэша подписок"""
+        author = User.objects.create_user(username='short_lived')
+        Follow.objects.create(user=self.user_2, author=author)
+        self.assertIn(author.pk, following_ids(self.user_2))
+        author.delete()
+        self.assertNotIn(author.pk, following_ids(self.user_2))
+
+    @override_settings(RATELIMITS={'add_comment': '2/m'})
+    def test_add_comment_rate_limited(self):
+        """Частые комментарии получают 429 с Retry-After"""
+        cache.clear()
+        url = reverse('posts:add_comment', kwargs={'post_id': self.post.pk})
+        for _ in range(2):
+            response = self.authorized_client.post(url, {'text': 'Спам'})
+            self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        response = self.authorized_client.post(url, {'text': 'Спам'})
+        self.assertEqual(response.status_code, HTTPStatus.TOO_MANY_REQUESTS)
+        self.assertGreater(int(response['Retry-After']), 0)
+        response = self.authorized_client_two.post(url, {'text': 'Текст'})
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+    def test_feed_since(self):
+        """Лента отдаёт только посты новее курсора"""
+        url = reverse('posts:index_since')
+        new_post = Post.objects.create(author=self.user_2, text='Новый')
+        response = self.client.get(url, {'after': self.post.pk})
+        self.assertEqual(
+            [post['id'] for post in response.json()['posts']], [new_post.pk]
+        )
+        self.assertEqual(response.json()['cursor'], new_post.pk)
+        response = self.client.get(url, {'after': new_post.pk, 'count': 1})
+        self.assertEqual(response.json(), {'count': 0, 'more': False})
+        Post.objects.bulk_create(
+            Post(author=self.user_2, text='Ещё')
+            for _ in range(FEED_SINCE_LIMIT + 1)
+        )
+        response = self.client.get(url, {'after': new_post.pk, 'count': 1})
+        self.assertEqual(
+            response.json(), {'count': FEED_SINCE_LIMIT, 'more': True}
+        )
+        response = self.authorized_client_two.get(
+            reverse('posts:follow_since'), {'after': 0}
+        )
+        self.assertEqual(response.json()['posts'], [])
+
+    def test_feed_since_stream(self):
+        """Поток Server-Sent Events начинается с новых постов"""
+        response = self.client.get(
+            reverse('posts:index_since'),
+            {'stream': 1},
+            HTTP_LAST_EVENT_ID='0',
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        event = next(iter(response.streaming_content)).decode()
+        self.assertTrue(event.startswith(f'id: {self.post.pk}\nevent: posts'))
+        response.close()
+
+    @override_settings(STREAMS_PER_CLIENT=1)
+    def test_feed_since_stream_limited_per_client(self):
+        """Клиент не держит больше STREAMS_PER_CLIENT потоков сразу"""
+        cache.clear()
+        url = reverse('posts:index_since')
+        response = self.client.get(url, {'stream': 1})
+        self.assertEqual(
+            self.client.get(url, {'stream': 1}).status_code,
+            HTTPStatus.TOO_MANY_REQUESTS,
+        )
+        response.close()
+        self.assertEqual(
+            self.client.get(url, {'wait': 1}).status_code, HTTPStatus.OK
+        )
+
+    def test_comment_stream(self):
+        """Поток комментариев отдаёт комментарии новее курсора"""
+        response = self.client.get(
+            reverse('posts:comment_stream', kwargs={'post_id': self.post.pk}),
+            {'after': 0},
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        event = next(iter(response.streaming_content)).decode()
+        self.assertTrue(
+            event.startswith(f'id: {self.comment.pk}\nevent: comment\n')
+        )
+        self.assertIn(self.comment.text, event)
+        response.close()
+        # комментарии из потока тоже с кнопкой лайка
+        self.assertIn('&hearts;', event)
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.assertNotContains(self.client.get(url), 'EventSource')
+        with self.settings(LIVE_STREAMS=True):
+            self.assertContains(self.client.get(url), 'EventSource')
+
+    def test_comment_stream_hides_deleted_users(self):
+        """Поток не отдаёт комментарии удаляемых пользователей"""
+        leaving = User.objects.create_user(username='leaving')
+        Comment.objects.create(
+            post=self.post, author=leaving, text='Прощальный комментарий'
+        )
+        request_deletion(leaving)
+        # кэш отметок сбрасывается после коммита, которого в тесте нет
+        cache.clear()
+        response = self.client.get(
+            reverse('posts:comment_stream', kwargs={'post_id': self.post.pk}),
+            {'after': 0},
+        )
+        events = []
+        for chunk in response.streaming_content:
+            if chunk.startswith(b': keepalive'):
+                break
+            events.append(chunk.decode())
+        response.close()
+        self.assertEqual(len(events), 1)
+        self.assertIn(self.comment.text, events[0])
+        cache.clear()
+
     def test_follow_displayed_on_expected_pages(self):
         """Новая запись пользователя появляется в ленте тех,
         кто на него подписан и не появляется в ленте тех, кто не подписан"""
@@ -251,6 +458,33 @@ class ViewsTest(TestCase):
             response_user_one.context['page_obj'], new_post.pk, error_two
         )
 
+    def test_author_cache(self):
+        """Профиль берёт автора и счётчики из кэша, кэш сбрасывается
+        при подписке и переименовании"""
+        cache.clear()
+        url = reverse('posts:profile', kwargs={'username': 'newcomer'})
+        self.assertEqual(
+            self.client.get(url).status_code, HTTPStatus.NOT_FOUND
+        )
+        newcomer = User.objects.create_user(username='newcomer')
+        self.assertEqual(self.client.get(url).status_code, HTTPStatus.OK)
+        self.authorized_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': 'newcomer'}
+        ))
+        with self.assertNumQueries(4):
+            # подписка сбросила счётчики: три COUNT по индексам и число
+            # постов страницы, автор - из кэша
+            response = self.client.get(url)
+        self.assertEqual(response.context['author'], newcomer)
+        self.assertEqual(response.context['counters']['followers'], 1)
+        with self.assertNumQueries(1):
+            self.client.get(url)
+        newcomer.username = 'renamed'
+        newcomer.save()
+        self.assertEqual(
+            self.client.get(url).status_code, HTTPStatus.NOT_FOUND
+        )
+
 
 class PaginatorViewsTest(TestCase):
     @classmethod
@@ -299,6 +533,24 @@ class PaginatorViewsTest(TestCase):
                     f'Страница {page}, не прошла проверку 2ой страницы'
                 )
 
+    def test_page_window(self):
+        """Пагинатор показывает края и окно вокруг текущей страницы"""
+        self.assertEqual(
+            page_window(50, 100_000),
+            [1, None, 48, 49, 50, 51, 52, None, 100_000]
+        )
+        self.assertEqual(page_window(1, 3), [1, 2, 3])
+        self.assertEqual(page_window(1, 1), [1])
+
+    def test_paginator_keeps_query(self):
+        """Ссылки пагинатора сохраняют остальные параметры запроса"""
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': self.user}),
+            {'archive': '', 'page': 1},
+        )
+        self.assertEqual(response.context['page_query'], 'archive=&')
+        self.assertContains(response, 'href="?archive=&amp;page=2"')
+
 
 class CacheTests(TestCase):
     @classmethod
@@ -320,3 +572,455 @@ class CacheTests(TestCase):
         cache.clear()
         after_clear_cache = self.client.get(reverse('posts:index'))
         self.assertNotEqual(after_clear_cache.content, after_delete)
+
+    def test_cache_index_shared_with_personal_header(self):
+        """Закэшированная гостем страница показывает шапку пользователя"""
+        cache.clear()
+        guest_response = self.client.get(reverse('posts:index'))
+        self.assertIsNotNone(guest_response.context)
+        authorized_client = Client()
+        authorized_client.force_login(self.user)
+        response = authorized_client.get(reverse('posts:index'))
+        self.assertNotIn(
+            'page_obj', response.context, 'Страница не взята из кэша'
+        )
+        self.assertContains(response, f'Пользователь: {self.user.username}')
+        self.assertContains(response, reverse('posts:follow_index'))
+        self.assertNotContains(guest_response, reverse('posts:follow_index'))
+
+
+class FollowSuggestionTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.friend = User.objects.create_user(username='friend')
+        cls.author = User.objects.create_user(username='author')
+        Follow.objects.create(user=cls.user, author=cls.friend)
+        Follow.objects.create(user=cls.friend, author=cls.author)
+
+    def test_friend_of_friend_suggested(self):
+        """Друг друга попадает в рекомендации и на страницу подписок"""
+        call_command('compute_follow_suggestions', stdout=StringIO())
+        suggestion = FollowSuggestion.objects.get(user=self.user)
+        self.assertEqual(suggestion.author, self.author)
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            [s.author for s in response.context['suggestions']],
+            [self.author]
+        )
+        follow_authors(self.user, [self.author.pk])
+        response = client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['suggestions']), [])
+
+    def test_recomputed_in_batches(self):
+        """Пересчёт пачками заменяет рекомендации, устаревшие удаляются"""
+        stale = User.objects.create_user(username='stale')
+        FollowSuggestion.objects.create(
+            user=stale, author=self.author, score=1
+        )
+        call_command(
+            'compute_follow_suggestions', batch_size=1, stdout=StringIO()
+        )
+        self.assertEqual(
+            list(FollowSuggestion.objects.values_list('user', 'author')),
+            [(self.user.pk, self.author.pk)],
+        )
+
+
+class PostAdminTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin_user = User.objects.create_superuser(
+            username='admin', email='admin@yatube.ru', password='admin'
+        )
+        cls.post = Post.objects.create(
+            author=cls.admin_user,
+            text='Пост для админки',
+        )
+
+    def setUp(self):
+        self.client.force_login(self.admin_user)
+
+    def test_changelist_uses_estimated_count(self):
+        """Список постов в админке открывается без точного COUNT"""
+        Post.objects.create(author=self.admin_user, text='Удалённый').delete()
+        url = reverse('admin:posts_post_changelist')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(
+            response.context['cl'].result_count, Post.objects.count()
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        # статистика устарела: страница за концом списка просто пустая
+        Post.objects.create(author=self.admin_user, text='Ещё').delete()
+        Post.objects.filter(pk=self.post.pk).delete()
+        response = self.client.get(url, {'p': 3})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(list(response.context['cl'].result_list), [])
+
+    def test_search_by_pk_and_author(self):
+        """Поиск по pk и @автору использует индексные поля"""
+        url = reverse('admin:posts_post_changelist')
+        for query in (str(self.post.pk), '@admin'):
+            with self.subTest(query=query):
+                response = self.client.get(url, {'q': query})
+                self.assertEqual(
+                    list(response.context['cl'].result_list), [self.post]
+                )
+
+
+class ArchiveTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='oldtimer')
+        cls.old_post = Post.objects.create(author=cls.user, text='Старый')
+        Post.objects.filter(pk=cls.old_post.pk).update(
+            pub_date=timezone.now() - timezone.timedelta(days=400)
+        )
+        cls.comment = Comment.objects.create(
+            post=cls.old_post, author=cls.user, text='Старый комментарий'
+        )
+        cls.new_post = Post.objects.create(author=cls.user, text='Новый')
+
+    def test_archive_posts(self):
+        """Старые посты уходят в архив и остаются доступными"""
+        call_command('archive_posts', stdout=StringIO())
+        self.assertEqual(list(Post.objects.all()), [self.new_post])
+        self.assertTrue(ArchivedComment.objects.filter(
+            pk=self.comment.pk, post_id=self.old_post.pk
+        ).exists())
+        response = self.client.get(reverse(
+            'posts:post_detail', kwargs={'post_id': self.old_post.pk}
+        ))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response.context['archived'])
+        self.assertContains(response, self.comment.text)
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': self.user}),
+            {'archive': 1},
+        )
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            [self.old_post.pk]
+        )
+
+    def test_archive_keeps_likes_and_views(self):
+        """Лайки и просмотры переезжают в архивную копию"""
+        cache.clear()
+        reader = User.objects.create_user(username='fan')
+        likes.set_like(likes.POST, reader, self.old_post.pk, True)
+        likes.set_like(likes.COMMENT, reader, self.comment.pk, True)
+        Post.objects.filter(pk=self.old_post.pk).update(view_count=7)
+        call_command('archive_posts', stdout=StringIO())
+        archived = ArchivedPost.objects.get(pk=self.old_post.pk)
+        self.assertEqual((archived.like_count, archived.view_count), (1, 7))
+        self.assertEqual(
+            ArchivedComment.objects.get(pk=self.comment.pk).like_count, 1
+        )
+        self.assertFalse(
+            PostLikeCounter.objects.filter(post_id=self.old_post.pk).exists()
+        )
+        response = self.client.get(reverse(
+            'posts:post_detail', kwargs={'post_id': self.old_post.pk}
+        ))
+        self.assertContains(response, 'Просмотров: 7')
+        self.assertContains(response, '&hearts; 1', count=2)
+
+
+class RenderedTextTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='writer')
+
+    def test_html_rendered_on_save(self):
+        """HTML и анонс считаются при сохранении, текст экранируется"""
+        post = Post.objects.create(
+            author=self.user, text='<b>жирный</b>\n\n' + 'слово ' * 100
+        )
+        self.assertTrue(post.text_html.startswith(
+            '<p>&lt;b&gt;жирный&lt;/b&gt;</p>'
+        ))
+        self.assertLess(len(post.excerpt_html), len(post.text_html))
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, post.excerpt_html)
+        self.assertNotIn('text', response.context['page_obj'][0].__dict__)
+
+    def test_render_text_backfill(self):
+        """Команда заполняет HTML у старых строк"""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Пост {i}') for i in range(3)
+        )
+        call_command('render_text', batch_size=2, stdout=StringIO())
+        self.assertEqual(
+            sorted(Post.objects.values_list('text_html', flat=True)),
+            [f'<p>Пост {i}</p>' for i in range(3)],
+        )
+
+    def test_backfill_migration(self):
+        """Миграция 0019 заполняет анонсы старых строк"""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Старый {i}') for i in range(2)
+        )
+        import_module(
+            'posts.migrations.0019_backfill_rendered_text'
+        ).backfill(apps, None)
+        self.assertEqual(
+            sorted(Post.objects.values_list('excerpt_html', flat=True)),
+            [f'<p>Старый {i}</p>' for i in range(2)],
+        )
+
+    def test_card_without_excerpt(self):
+        """Пост, записанный мимо save(), показывается по тексту"""
+        cache.clear()
+        Post.objects.bulk_create([Post(author=self.user, text='Без анонса')])
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, '<p>Без анонса</p>')
+
+
+class BackgroundDeletionTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='prolific')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Большая', slug='big')
+        cls.post = Post.objects.create(
+            author=cls.author, text='Пост', group=cls.group
+        )
+        Comment.objects.create(post=cls.post, author=cls.reader, text='К')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def tearDown(self):
+        # отметки об удалении откатываются вместе с тестом, а кэш - нет
+        cache.clear()
+
+    def test_user_hidden_then_purged(self):
+        """Удаляемый автор сразу пропадает, данные удаляются пачками"""
+        cache.clear()
+        request_deletion(self.author)
+        self.assertNotIn(
+            self.post, self.client.get(reverse('posts:index')).context[
+                'page_obj'
+            ]
+        )
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': 'prolific'})
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        call_command('purge_deleted', batch_size=1, stdout=StringIO())
+        self.assertFalse(User.objects.filter(username='prolific').exists())
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(PendingDeletion.objects.exists())
+
+    def test_comments_of_deleted_user_hidden(self):
+        """Комментарии удаляемого пользователя сразу пропадают"""
+        cache.clear()
+        request_deletion(self.reader)
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        self.assertEqual(list(response.context['comments']), [])
+
+    def test_group_purge_keeps_posts(self):
+        """После удаления группы посты остаются без группы"""
+        cache.clear()
+        request_deletion(self.group)
+        response = self.client.get(
+            reverse('posts:group_posts', kwargs={'slug': 'big'})
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        # пост остаётся в ленте, но уже без группы
+        page = self.client.get(reverse('posts:index')).context['page_obj']
+        self.assertEqual([post.pk for post in page], [self.post.pk])
+        self.assertIsNone(page[0].group)
+        call_command('purge_deleted', stdout=StringIO())
+        self.assertFalse(Group.objects.filter(slug='big').exists())
+        self.post.refresh_from_db()
+        self.assertIsNone(self.post.group_id)
+
+
+class DigestTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(
+            username='subscriber', email='subscriber@yatube.ru'
+        )
+        cls.author = User.objects.create_user(username='busy')
+        cls.other = User.objects.create_user(username='quiet')
+        stranger = User.objects.create_user(username='stranger')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Follow.objects.create(user=cls.reader, author=cls.other)
+        for author in (cls.author, cls.author, cls.other, stranger):
+            Post.objects.create(author=author, text='Новость')
+
+    def test_digest_sent_once(self):
+        """Сводка считает новые посты по авторам и не повторяется"""
+        cache.clear()
+        call_command('send_digests', batch_size=1, stdout=StringIO())
+        digest = Digest.objects.get(user=self.reader)
+        self.assertEqual(digest.post_count, 3)
+        self.assertEqual(
+            json.loads(digest.items), [['busy', 2], ['quiet', 1]]
+        )
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['subscriber@yatube.ru'])
+        client = Client()
+        client.force_login(self.reader)
+        response = client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['digest'], digest)
+        call_command('send_digests', stdout=StringIO())
+        self.assertEqual(Digest.objects.count(), 1)
+
+    def test_crashed_run_resumed(self):
+        """Упавшая рассылка продолжается со следующего подписчика"""
+        cache.clear()
+        second = User.objects.create_user(
+            username='second', email='second@yatube.ru'
+        )
+        Follow.objects.create(user=second, author=self.author)
+        run = send_digests(batch_size=1)
+        next(run)
+        run.close()
+        self.assertEqual(Digest.objects.count(), 1)
+        # пока запуск свежий, второй не начинается
+        call_command('send_digests', stdout=StringIO())
+        self.assertEqual(Digest.objects.count(), 1)
+        DigestRun.objects.update(
+            updated=timezone.now() - timezone.timedelta(hours=1)
+        )
+        call_command('send_digests', stdout=StringIO())
+        self.assertEqual(
+            sorted(Digest.objects.values_list('user__username', flat=True)),
+            ['second', 'subscriber'],
+        )
+        self.assertEqual(len(mail.outbox), 2)
+        run = DigestRun.objects.get()
+        self.assertTrue(run.finished)
+        self.assertEqual(run.digest_count, 2)
+
+
+class ViewCounterTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='popular')
+        cls.post = Post.objects.create(author=cls.author, text='Хит')
+
+    def test_views_flushed_in_batch(self):
+        """Просмотры копятся в памяти и записываются одним сбросом"""
+        # в буфере могут быть просмотры постов из других тестов с тем же pk
+        counters.flush()
+        self.post.refresh_from_db()
+        before = self.post.view_count
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        for _ in range(3):
+            self.client.get(url)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.view_count, before)
+        counters.flush()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.view_count, before + 3)
+        self.assertEqual(
+            PostViewHour.objects.get(post=self.post).views, before + 3
+        )
+        client = Client()
+        client.force_login(self.author)
+        response = client.get(reverse('posts:author_stats'))
+        self.assertEqual(response.context['total_views'], before + 3)
+        self.assertEqual(list(response.context['top_posts']), [self.post])
+
+    def test_many_posts_flushed_in_chunks(self):
+        """Просмотры сотен постов пишутся несколькими UPDATE"""
+        counters.flush()
+        Post.objects.bulk_create(
+            Post(author=self.author, text='Пост')
+            for _ in range(VIEW_UPDATE_CHUNK * 2 + 1)
+        )
+        posts = Post.objects.filter(author=self.author).exclude(
+            pk=self.post.pk
+        )
+        for post in posts:
+            counters.record_view(post.pk)
+        counters.flush()
+        self.assertEqual(
+            sum(posts.values_list('view_count', flat=True)),
+            VIEW_UPDATE_CHUNK * 2 + 1,
+        )
+        self.assertEqual(
+            PostViewHour.objects.filter(post__in=posts).count(),
+            VIEW_UPDATE_CHUNK * 2 + 1,
+        )
+
+
+class LikeTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='liked')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.posts = [
+            Post.objects.create(author=cls.author, text=f'Пост {i}')
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_like_once(self):
+        """Повторный лайк не учитывается, сумма шардов равна числу лайков"""
+        post = self.posts[0]
+        url = reverse('posts:post_like', args=[post.pk])
+        for _ in range(2):
+            response = self.client.post(url, {'next': '/'})
+        self.assertRedirects(response, '/')
+        self.assertEqual(PostLike.objects.filter(post=post).count(), 1)
+        self.assertEqual(likes.get_counts(likes.POST, [post.pk]), {post.pk: 1})
+        self.client.post(reverse('posts:post_unlike', args=[post.pk]))
+        self.assertFalse(PostLike.objects.filter(post=post).exists())
+        self.assertEqual(
+            sum(PostLikeCounter.objects.filter(
+                post=post
+            ).values_list('count', flat=True)),
+            0,
+        )
+
+    def test_page_like_state(self):
+        """Состояние лайков страницы читается одним запросом"""
+        likes.set_like(likes.POST, self.reader, self.posts[1].pk, True)
+        ids = [post.pk for post in self.posts]
+        likes.get_counts(likes.POST, ids)
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                likes.liked_ids(likes.POST, self.reader, ids),
+                {self.posts[1].pk},
+            )
+            counts = likes.get_counts(likes.POST, ids)
+        self.assertEqual(counts[self.posts[1].pk], 1)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(
+            response,
+            reverse('posts:post_unlike', args=[self.posts[1].pk]),
+        )
+        self.assertContains(
+            response, reverse('posts:post_like', args=[self.posts[0].pk])
+        )
+
+    def test_deleted_user_likes_forgotten(self):
+        """Лайки удалённого пользователя вычитаются из счётчиков"""
+        post = self.posts[2]
+        likes.set_like(likes.POST, self.reader, post.pk, True)
+        request_deletion(self.reader)
+        call_command('purge_deleted', stdout=StringIO())
+        self.assertEqual(likes.get_counts(likes.POST, [post.pk])[post.pk], 0)
@@ -6,8 +6,12 @@ app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('since/', views.index_since, name='index_since'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('follow/since/', views.follow_since, name='follow_since'),
+    path('follow/bulk/', views.follow_bulk, name='follow_bulk'),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path('stats/', views.author_stats, name='author_stats'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -23,6 +27,26 @@ urlpatterns = [
     path(
         'posts/<int:post_id>/comment/', views.add_comment, name='add_comment'
     ),
+    path(
+        'posts/<int:post_id>/comments/stream/',
+        views.comment_stream,
+        name='comment_stream'
+    ),
+    path('posts/<int:post_id>/like/', views.post_like, name='post_like'),
+    path(
+        'posts/<int:post_id>/unlike/', views.post_unlike, name='post_unlike'
+    ),
+    path(
+        'comments/<int:comment_id>/like/',
+        views.comment_like,
+        name='comment_like'
+    ),
+    path(
+        'comments/<int:comment_id>/unlike/',
+        views.comment_unlike,
+        name='comment_unlike'
+    ),
     path('create/', views.post_create, name='post_create'),
+    path('groups/', views.group_index, name='group_index'),
     path('group/<slug:slug>/', views.group_posts, name='group_posts'),
 ]
@@ -1,12 +1,158 @@
+import json
+import time
+
+from django.conf import settings
 from django.core.paginator import Paginator
+from django.template.loader import render_to_string
+from django.urls import reverse
+
+from core import pubsub
+
+from posts.authors import attach_authors
+from posts.deletion import hide_deleted
+from posts.groups import attach_groups
+from posts.models import Post
+from posts.tasks import optimize_post_image
+from posts.constants import (
+    COMMENT_STREAM_DURATION,
+    FEED_POLL_INTERVAL,
+    FEED_SINCE_LIMIT,
+    FEED_STREAM_DURATION,
+    PAGINATOR_EDGE,
+    PAGINATOR_WINDOW,
+    POSTS_PER_PAGE,
+)
 
-from posts.constants import POSTS_PER_PAGE
+
+def page_window(number, num_pages, window=PAGINATOR_WINDOW,
+                edge=PAGINATOR_EDGE):
+    """Номера страниц для пагинатора: края и окно вокруг текущей,
+    None - пропуск ("…"). Размер не зависит от числа страниц"""
+    pages = sorted(
+        set(range(1, edge + 1))
+        | set(range(number - window, number + window + 1))
+        | set(range(num_pages - edge + 1, num_pages + 1))
+    )
+    links = []
+    for page in pages:
+        if page < 1 or page > num_pages:
+            continue
+        if links and page - links[-1] > 1:
+            links.append(None)
+        links.append(page)
+    return links
 
 
 def get_page_context(posts, request):
     paginator = Paginator(posts, POSTS_PER_PAGE)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
-    return {
+    model = paginator.object_list.model
+    if hasattr(model, 'group'):
+        page_obj.object_list = attach_groups(list(page_obj.object_list))
+    if hasattr(model, 'author'):
+        page_obj.object_list = attach_authors(list(page_obj.object_list))
+    query = request.GET.copy()
+    query.pop('page', None)
+    context = {
         'page_obj': page_obj,
+        'page_links': page_window(page_obj.number, paginator.num_pages),
+        'page_query': query.urlencode() + '&' if query else '',
     }
+    if model is Post:
+        # лайки всех постов страницы читаются одним запросом
+        context['like_ids'] = [post.pk for post in page_obj.object_list]
+    return context
+
+
+def schedule_image_optimization(post):
+    """После коммита ставит уменьшение картинки поста в очередь задач"""
+    if post.image and settings.IMAGE_WORKERS:
+        optimize_post_image.enqueue(post.pk, post.image.name)
+
+
+def parse_cursor(value):
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def posts_since(posts, cursor, limit=FEED_SINCE_LIMIT):
+    """Посты новее курсора (id последнего известного поста) по индексу pk"""
+    rows = posts.filter(pk__gt=cursor).order_by('pk').values(
+        'pk', 'text', 'pub_date', 'author__username', 'group__slug'
+    )[:limit]
+    return [
+        {
+            'id': row['pk'],
+            'text': row['text'],
+            'pub_date': row['pub_date'].isoformat(),
+            'author': row['author__username'],
+            'group': row['group__slug'],
+            'url': reverse('posts:post_detail', args=(row['pk'],)),
+        }
+        for row in rows
+    ]
+
+
+def wait_for_posts(posts, cursor, timeout):
+    """Long polling: ждёт новые посты, пока не истечёт timeout.
+
+    Раз в FEED_POLL_INTERVAL проверяет exists() по индексу pk, поэтому
+    видит посты, созданные в любом воркере.
+    """
+    deadline = time.monotonic() + timeout
+    new_posts = posts.filter(pk__gt=cursor)
+    while not new_posts.exists():
+        if time.monotonic() >= deadline:
+            return
+        time.sleep(FEED_POLL_INTERVAL)
+
+
+def stream_posts(posts, cursor, duration=FEED_STREAM_DURATION):
+    """Server-Sent Events с новыми постами; клиент переподключается сам
+    и передаёт Last-Event-ID"""
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        new_posts = posts_since(posts, cursor)
+        if new_posts:
+            cursor = new_posts[-1]['id']
+            yield 'id: {}\nevent: posts\ndata: {}\n\n'.format(
+                cursor, json.dumps(new_posts, ensure_ascii=False)
+            )
+            continue
+        yield ': keepalive\n\n'
+        time.sleep(FEED_POLL_INTERVAL)
+
+
+def stream_comments(request, post, cursor, channel,
+                    duration=COMMENT_STREAM_DURATION):
+    """Server-Sent Events с HTML новых комментариев к посту.
+
+    Между событиями поток спит в pubsub.wait и БД не трогает.
+    """
+    deadline = time.monotonic() + duration
+    version = None
+    while time.monotonic() < deadline:
+        # комментарии удаляемых пользователей скрыты, как и в post_detail
+        comments = list(hide_deleted(
+            post.comments.filter(pk__gt=cursor)
+        ).select_related('author').order_by('pk'))
+        # лайки всей пачки загружаются одним запросом
+        like_ids = [comment.pk for comment in comments]
+        for comment in comments:
+            cursor = comment.pk
+            html = render_to_string(
+                'posts/includes/comment.html',
+                {'comment': comment, 'comment_like_ids': like_ids},
+                request=request,
+            )
+            data = ''.join(
+                f'data: {line}\n' for line in html.splitlines()
+            )
+            yield f'id: {cursor}\nevent: comment\n{data}\n'
+        yield ': keepalive\n\n'
+        version = pubsub.wait(
+            channel, version, deadline - time.monotonic()
+        )
@@ -1,65 +1,206 @@
+import json
+
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
-
-from .models import Post, Group, User, Comment, Follow
+from django.db.models import F, Sum
+from django.http import (
+    Http404,
+    HttpResponseBadRequest,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import is_safe_url
+from django.views.decorators.http import require_POST
+
+from core.cache import shared_cache_page
+from core.ratelimit import (
+    SlotStream,
+    acquire_slot,
+    ratelimit,
+    too_many_requests,
+)
+from .constants import (
+    COMMENT_STREAM_DURATION,
+    FEED_MAX_WAIT,
+    FEED_SINCE_LIMIT,
+    LIST_DEFERRED,
+    STATS_HOURS,
+    STATS_TOP_POSTS,
+    SUGGESTIONS_COUNT,
+)
+from .counters import record_view
+from .models import (
+    ArchivedPost, Comment, PendingDeletion, Post, PostViewHour, Group, User
+)
 from .forms import PostForm, CommentForm
-from .utils import get_page_context
-
-
-@cache_page(20, key_prefix='index_page')
+from .signals import comments_channel
+from .authors import attach_authors, get_author, get_counters
+from .deletion import hidden_ids, hide_deleted
+from .groups import attach_groups, get_by_slug
+from .follow_graph import following_ids, follow_authors, unfollow_authors
+from .likes import COMMENT, POST, set_like
+from .utils import (
+    get_page_context,
+    parse_cursor,
+    posts_since,
+    schedule_image_optimization,
+    stream_comments,
+    stream_posts,
+    wait_for_posts,
+)
+
+
+@shared_cache_page(20, key_prefix='index_page', version_name='posts')
 def index(request):
     """Вью для вывода главной страницы с помощью генерации модели Post"""
     #context = {'index': True}
-    context = get_page_context(Post.objects.all(), request)
+    context = get_page_context(
+        hide_deleted(Post.objects.defer(*LIST_DEFERRED)), request
+    )
     #context.update(get_page_context(Post.objects.all(), request))
     #index = True
     return render(request, 'posts/index.html', context)
 
 
+def group_index(request):
+    """Каталог групп с числом постов и датой последней активности"""
+    groups = Group.objects.exclude(
+        pk__in=hidden_ids()[PendingDeletion.GROUP]
+    ).order_by(
+        F('last_post_at').desc(nulls_last=True), 'title'
+    )
+    context = get_page_context(groups, request)
+
+    return render(request, 'posts/groups.html', context)
+
+
+@shared_cache_page(20, key_prefix='group_page', version_name='posts')
 def group_posts(request, slug):
     """"Вью для вывода страницы group/ с помощью модели Group"""
-    group = get_object_or_404(Group, slug=slug)
+    group = get_by_slug(slug)
+    if group is None:
+        raise Http404('Группа не найдена')
     context = {
         'group': group,
     }
-    context.update(get_page_context(group.posts.all(), request))
+    context.update(
+        get_page_context(group.posts.defer(*LIST_DEFERRED), request)
+    )
 
     return render(request, 'posts/group_list.html', context)
 
 
 def profile(request, username):
     """Здесь код запроса к модели и создание словаря контекста"""
-    author = get_object_or_404(User, username=username)
+    author = get_author(username)
+    if author is None or author.pk in hidden_ids()[PendingDeletion.USER]:
+        raise Http404('Пользователь не найден')
     posts = Post.objects.filter(author=author)
-    following = False
-    if request.user.is_authenticated:
-        following = request.user.follower.filter(author=author).exists()
+    following = author.pk in following_ids(request.user)
+    archive = bool(request.GET.get('archive'))
     context = {
         'author': author,
+        'counters': get_counters(author.pk),
         'posts': posts,
         'following': following,
+        'archive': archive,
     }
-    context.update(get_page_context(author.posts.all(), request))
+    if archive:
+        context.update(
+            get_page_context(
+                author.archived_posts.defer(*LIST_DEFERRED), request
+            )
+        )
+    else:
+        context.update(
+            get_page_context(author.posts.defer(*LIST_DEFERRED), request)
+        )
 
     return render(request, 'posts/profile.html', context)
 
 
 def post_detail(request, post_id):
     """Здесь код запроса к модели и создание словаря контекста"""
-    post = get_object_or_404(Post, pk=post_id)
+    post = Post.objects.filter(pk=post_id).first()
+    archived = post is None
+    if archived:
+        post = get_object_or_404(ArchivedPost, pk=post_id)
+    if post.author_id in hidden_ids()[PendingDeletion.USER]:
+        raise Http404('Пост удалён')
+    attach_groups([post])
+    attach_authors([post])
+    if not archived:
+        record_view(post.pk)
     form = CommentForm(request.POST or None)
-    comments = Comment.objects.filter(post=post)
+    comments = hide_deleted(post.comments.all())
     context = {
         'post': post,
         'form': form,
         'comments': comments,
+        'archived': archived,
     }
+    if not archived:
+        context['live_comments'] = settings.LIVE_STREAMS
+        context['post_like_ids'] = [post.pk]
+        context['comment_like_ids'] = [comment.pk for comment in comments]
 
     return render(request, 'posts/post_detail.html', context)
 
 
 @login_required
+def author_stats(request):
+    """Просмотры постов автора: по часам и самые популярные посты"""
+    since = timezone.now() - timezone.timedelta(hours=STATS_HOURS)
+    posts = Post.objects.filter(author=request.user)
+    hours = PostViewHour.objects.filter(
+        post__author=request.user, hour__gte=since
+    ).values('hour').annotate(views=Sum('views')).order_by('hour')
+    # просмотры архивных постов тоже входят в общий итог
+    total_views = sum(
+        queryset.aggregate(total=Sum('view_count'))['total'] or 0
+        for queryset in (posts, request.user.archived_posts.all())
+    )
+    context = {
+        'total_views': total_views,
+        'hours': hours,
+        'top_posts': posts.defer(*LIST_DEFERRED).order_by(
+            '-view_count', '-pub_date'
+        )[:STATS_TOP_POSTS],
+    }
+
+    return render(request, 'posts/stats.html', context)
+
+
+@ratelimit('comment_stream', '30/m', methods=None)
+def comment_stream(request, post_id):
+    """Поток новых комментариев к посту (Server-Sent Events)"""
+    post = get_object_or_404(Post, pk=post_id)
+    cursor = parse_cursor(
+        request.META.get('HTTP_LAST_EVENT_ID') or request.GET.get('after')
+    )
+    release = acquire_slot(
+        request, 'comment_stream', settings.STREAMS_PER_CLIENT
+    )
+    if release is None:
+        return too_many_requests(request, COMMENT_STREAM_DURATION)
+    response = StreamingHttpResponse(
+        SlotStream(
+            stream_comments(
+                request, post, cursor, comments_channel(post.pk)
+            ),
+            release,
+        ),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+@login_required
+@ratelimit('post_create', '10/m')
 def post_create(request):
     form = PostForm(
         request.POST or None,
@@ -69,6 +210,7 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        schedule_image_optimization(post)
 
         return redirect('posts:profile', username=request.user.username)
 
@@ -87,6 +229,8 @@ def post_edit(request, post_id):
         return redirect('posts:post_detail', post.pk)
     if form.is_valid():
         form.save()
+        if 'image' in form.changed_data:
+            schedule_image_optimization(post)
         return redirect('posts:post_detail', post_id)
 
     context = {
@@ -98,6 +242,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@ratelimit('add_comment', '30/m')
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
@@ -110,31 +255,195 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+def redirect_back(request, default):
+    """На страницу из POST-параметра next, если она с этого сайта"""
+    next_url = request.POST.get('next')
+    if not is_safe_url(next_url, allowed_hosts={request.get_host()}):
+        next_url = default
+    return redirect(next_url)
+
+
+@login_required
+@require_POST
+@ratelimit('like', '120/m')
+def post_like(request, post_id):
+    """Лайк поста"""
+    post = get_object_or_404(Post, pk=post_id)
+    set_like(POST, request.user, post.pk, True)
+
+    return redirect_back(request, reverse('posts:post_detail', args=[post.pk]))
+
+
+@login_required
+@require_POST
+@ratelimit('like', '120/m')
+def post_unlike(request, post_id):
+    """Снять лайк с поста"""
+    set_like(POST, request.user, post_id, False)
+
+    return redirect_back(request, reverse('posts:post_detail', args=[post_id]))
+
+
+@login_required
+@require_POST
+@ratelimit('like', '120/m')
+def comment_like(request, comment_id):
+    """Лайк комментария"""
+    comment = get_object_or_404(Comment, pk=comment_id)
+    set_like(COMMENT, request.user, comment.pk, True)
+
+    return redirect_back(
+        request, reverse('posts:post_detail', args=[comment.post_id])
+    )
+
+
+@login_required
+@require_POST
+@ratelimit('like', '120/m')
+def comment_unlike(request, comment_id):
+    """Снять лайк с комментария"""
+    comment = get_object_or_404(Comment, pk=comment_id)
+    set_like(COMMENT, request.user, comment.pk, False)
+
+    return redirect_back(
+        request, reverse('posts:post_detail', args=[comment.post_id])
+    )
+
+
 @login_required
 def follow_index(request):
     """"Страница подписок"""
-    posts = Post.objects.filter(author__following__user=request.user)
+    posts = hide_deleted(Post.objects.filter(
+        author__following__user=request.user
+    ).defer(*LIST_DEFERRED))
     context = get_page_context(posts, request)
+    # рекомендации считаются офлайн: за это время пользователь мог
+    # подписаться на автора, а автор - оказаться удалённым
+    context['suggestions'] = request.user.follow_suggestions.exclude(
+        author_id__in=following_ids(request.user)
+        | hidden_ids()[PendingDeletion.USER]
+    ).select_related('author')[:SUGGESTIONS_COUNT]
+    digest = request.user.digests.first()
+    if digest is not None:
+        context['digest'] = digest
+        context['digest_entries'] = json.loads(digest.items)
 
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
+@ratelimit('follow', '60/m', methods=None)
 def profile_follow(request, username):
     """Подписаться на автора"""
-    author = get_object_or_404(User, username=username)
-    if author != request.user:
-        Follow.objects.get_or_create(user=request.user, author=author)
+    author = get_author(username)
+    if author is None:
+        raise Http404('Пользователь не найден')
+    follow_authors(request.user, [author.pk])
 
     return redirect("posts:profile", username=username)
 
 
 @login_required
+@ratelimit('follow', '60/m', methods=None)
 def profile_unfollow(request, username):
     """Дизлайк, отписка"""
-    Follow.objects.filter(
-        user=request.user,
-        author__username=username
-    ).delete()
+    author = get_author(username)
+    if author is not None:
+        unfollow_authors(request.user, [author.pk])
 
     return redirect("posts:profile", username=username)
+
+
+@login_required
+@require_POST
+@ratelimit('follow', '60/m')
+def follow_bulk(request):
+    """Пакетная подписка и отписка: JSON {"follow": [...], "unfollow": [...]}
+    со списками имён пользователей"""
+    try:
+        data = json.loads(request.body)
+        to_follow = data.get('follow', [])
+        to_unfollow = data.get('unfollow', [])
+    except (ValueError, AttributeError):
+        return HttpResponseBadRequest('Ожидается JSON-объект')
+    if not all(
+        isinstance(names, list)
+        and all(isinstance(name, str) for name in names)
+        for names in (to_follow, to_unfollow)
+    ):
+        return HttpResponseBadRequest('Ожидаются списки имён пользователей')
+    if to_follow:
+        follow_authors(
+            request.user,
+            User.objects.filter(username__in=to_follow).values_list(
+                'pk', flat=True
+            ),
+        )
+    if to_unfollow:
+        unfollow_authors(
+            request.user,
+            User.objects.filter(username__in=to_unfollow).values('pk'),
+        )
+    following = User.objects.filter(
+        pk__in=following_ids(request.user)
+    ).values_list('username', flat=True)
+
+    return JsonResponse({'following': sorted(following)})
+
+
+def feed_since(request, posts):
+    """Новые посты после курсора ?after=<id>: JSON, long polling
+    (?wait=<сек>) или поток Server-Sent Events (?stream=1)"""
+    cursor = parse_cursor(
+        request.META.get('HTTP_LAST_EVENT_ID') or request.GET.get('after')
+    )
+    stream = bool(request.GET.get('stream'))
+    wait = min(parse_cursor(request.GET.get('wait')), FEED_MAX_WAIT)
+    release = None
+    if stream or wait:
+        release = acquire_slot(
+            request, 'feed_since', settings.STREAMS_PER_CLIENT
+        )
+        if release is None:
+            return too_many_requests(request, FEED_MAX_WAIT)
+    if stream:
+        response = StreamingHttpResponse(
+            SlotStream(stream_posts(posts, cursor), release),
+            content_type='text/event-stream',
+        )
+        response['Cache-Control'] = 'no-cache'
+        return response
+    if wait:
+        try:
+            wait_for_posts(posts, cursor, wait)
+        finally:
+            release()
+    if request.GET.get('count'):
+        # считаем не дальше FEED_SINCE_LIMIT + 1 постов, клиенту хватит "50+"
+        count = posts.filter(pk__gt=cursor).order_by('pk').values('pk')[
+            :FEED_SINCE_LIMIT + 1
+        ].count()
+        return JsonResponse({
+            'count': min(count, FEED_SINCE_LIMIT),
+            'more': count > FEED_SINCE_LIMIT,
+        })
+    new_posts = posts_since(posts, cursor)
+    return JsonResponse({
+        'cursor': new_posts[-1]['id'] if new_posts else cursor,
+        'posts': new_posts,
+    })
+
+
+@ratelimit('feed_since', '60/m', methods=None)
+def index_since(request):
+    """Новые посты главной ленты"""
+    return feed_since(request, hide_deleted(Post.objects.all()))
+
+
+@login_required
+@ratelimit('feed_since', '60/m', methods=None)
+def follow_since(request):
+    """Новые посты в ленте подписок"""
+    return feed_since(request, hide_deleted(
+        Post.objects.filter(author__following__user=request.user)
+    ))
@@ -0,0 +1,11 @@
+from django.contrib.auth.forms import PasswordResetForm
+
+from core.jobs import task
+
+
+@task(priority=10)
+def send_password_reset(email: str, domain: str, use_https: bool):
+    """Письмо со ссылкой сброса пароля, если такой пользователь есть"""
+    form = PasswordResetForm({'email': email})
+    if form.is_valid():
+        form.save(domain_override=domain, use_https=use_https)
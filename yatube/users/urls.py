@@ -3,7 +3,6 @@ from django.contrib.auth.views import (
     LogoutView,
     PasswordChangeView,
     PasswordChangeDoneView,
-    PasswordResetView,
     PasswordResetDoneView,
     PasswordResetConfirmView,
     PasswordResetCompleteView
@@ -44,7 +43,7 @@ urlpatterns = [
     ),
     path(
         'password_reset/',
-        PasswordResetView.as_view(
+        views.PasswordReset.as_view(
             template_name='users/password_reset_form.html'),
         name='password_reset_form'
     ),
@@ -1,7 +1,10 @@
+from django.contrib.auth.views import PasswordResetView
+from django.http import HttpResponseRedirect
 from django.views.generic import CreateView
 from django.urls import reverse_lazy
 
 from .forms import CreationForm
+from .tasks import send_password_reset
 
 
 class SignUp(CreateView):
@@ -12,3 +15,15 @@ class SignUp(CreateView):
     form_class = CreationForm
     success_url = reverse_lazy('posts:index')
     template_name = 'users/signup.html'
+
+
+class PasswordReset(PasswordResetView):
+    """Письмо уходит фоновой задачей: страница отвечает одинаково быстро,
+    есть ли такой адрес и как бы ни работала почта"""
+    def form_valid(self, form):
+        send_password_reset.enqueue(
+            form.cleaned_data['email'],
+            self.request.get_host(),
+            self.request.is_secure(),
+        )
+        return HttpResponseRedirect(self.get_success_url())
@@ -0,0 +1,15 @@
+"""Настройки проекта, разделённые по окружениям.
+
+Окружение выбирается переменной DJANGO_ENV: dev (по умолчанию),
+prod или bench.
+"""
+import os
+
+DJANGO_ENV = os.environ.get('DJANGO_ENV', 'dev')
+
+if DJANGO_ENV == 'prod':
+    from .prod import *  # noqa: F401,F403
+elif DJANGO_ENV == 'bench':
+    from .bench import *  # noqa: F401,F403
+else:
+    from .dev import *  # noqa: F401,F403
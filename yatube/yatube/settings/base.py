@@ -0,0 +1,250 @@
+import os
+
+# Build paths inside the project like this: os.path.join(BASE_DIR, ...)
+BASE_DIR = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+
+
+# Quick-start development settings - unsuitable for production
+# See https://docs.djangoproject.com/en/2.2/howto/deployment/checklist/
+
+# SECURITY WARNING: keep the secret key used in production secret!
+SECRET_KEY = os.environ.get(
+    'SECRET_KEY', '^&bih!jj^6kli^$9_yn!q4=sxi8_t+e3e-4)13z@p4nq9w2@=s'
+)
+
+# SECURITY WARNING: don't run with debug turned on in production!
+DEBUG = os.environ.get('DEBUG', '') == '1'
+
+ALLOWED_HOSTS = [
+    'localhost',
+    '127.0.0.1',
+    '[::1]',
+    'testserver',
+]
+
+
+# Application definition
+
+# Приложения, без которых проект не работает
+CORE_APPS = [
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'posts.apps.PostsConfig',
+    'users.apps.UsersConfig',
+    'core.apps.CoreConfig',
+    'about.apps.AboutConfig',
+    'sorl.thumbnail',
+]
+
+# Необязательные приложения: подключаются только там, где нужны,
+# чтобы не импортировать их при старте каждого воркера
+OPTIONAL_APPS = [
+    'django.contrib.admin',
+]
+
+ENABLED_OPTIONAL_APPS = [
+    app for app in OPTIONAL_APPS
+    if app in os.environ.get('OPTIONAL_APPS', '').split(',')
+]
+
+INSTALLED_APPS = ENABLED_OPTIONAL_APPS + CORE_APPS
+
+# Приложения, время импорта которых показывает manage.py startup_profile
+STARTUP_PROFILE_APPS = [
+    'posts',
+    'users',
+    'core',
+    'about',
+    'sorl.thumbnail',
+]
+
+MIDDLEWARE = [
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'core.auth.CachedAuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+ROOT_URLCONF = 'yatube.urls'
+
+TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [TEMPLATES_DIR],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.debug',
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+                'core.context_processors.year.year',
+            ],
+        },
+    },
+]
+
+STATICFILES_DIRS = [
+    os.path.join(BASE_DIR, 'static')
+]
+
+WSGI_APPLICATION = 'yatube.wsgi.application'
+
+
+# Database
+# https://docs.djangoproject.com/en/2.2/ref/settings/#databases
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get(
+            'SQLITE_PATH', os.path.join(BASE_DIR, 'db.sqlite3')
+        ),
+    }
+}
+
+
+# Password validation
+# https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
+    },
+]
+
+# Links after login
+
+LOGIN_URL = 'users:login'
+
+LOGIN_REDIRECT_URL = 'posts:index'
+
+# Письма пишутся в исходящую очередь (core.mail) и отправляются фоновой
+# задачей через OUTBOX_EMAIL_BACKEND, здесь - filebased.EmailBackend
+
+EMAIL_BACKEND = 'core.mail.OutboxEmailBackend'
+OUTBOX_EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+OUTBOX_BATCH_SIZE = 50
+OUTBOX_MAX_ATTEMPTS = 5
+# Сколько дней хранить отправленные и упавшие письма
+OUTBOX_RETENTION_DAYS = 7
+
+# Адрес сайта для ссылок в письмах, которые собираются вне запроса
+SITE_URL = os.environ.get('SITE_URL', 'http://localhost:8000')
+
+# указываем директорию, в которую будут складываться файлы писем
+
+EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
+
+
+# Internationalization
+# https://docs.djangoproject.com/en/2.2/topics/i18n/
+
+LANGUAGE_CODE = 'ru'
+
+TIME_ZONE = 'UTC'
+
+USE_I18N = True
+
+USE_L10N = True
+
+USE_TZ = True
+
+
+# Static files (CSS, JavaScript, Images)
+# https://docs.djangoproject.com/en/2.2/howto/static-files/
+
+STATIC_URL = '/static/'
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Обработка загруженных картинок: предельный размер после уменьшения,
+# защита от "бомб" и число процессов очереди images (0 - не обрабатывать)
+IMAGE_MAX_SIZE = (1920, 1920)
+IMAGE_MAX_PIXELS = 40_000_000
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', 2))
+
+# Очереди фоновых задач: сколько задач очереди выполняется одновременно
+# и в каком пуле (thread или process), см. core.jobs и manage.py run_workers
+JOB_QUEUES = {
+    'default': {'concurrency': 4, 'pool': 'thread'},
+    'images': {'concurrency': IMAGE_WORKERS, 'pool': 'process'},
+}
+# Задача, воркер которой столько не отмечался, считается брошенной
+# и возвращается в очередь
+JOB_TIMEOUT = 10 * 60
+# Сколько дней хранить выполненные и упавшие задачи
+JOB_RETENTION_DAYS = 7
+
+# Загрузки хранятся под хешем содержимого, дубликаты не сохраняются
+DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedStorage'
+# Миниатюры sorl ищет по вычисленному им имени и не ведёт счётчик ссылок,
+# поэтому они лежат в обычном хранилище
+THUMBNAIL_STORAGE = 'django.core.files.storage.FileSystemStorage'
+
+# Отдавать статику и медиа самим приложением (для установок без CDN)
+SERVE_STATIC = os.environ.get('SERVE_STATIC', '') == '1'
+
+# Таблицы стилей, из которых collectstatic выбрасывает неиспользуемые классы
+STATIC_PURGE_CSS = [
+    'css/bootstrap.min.css',
+]
+# Классы, которые добавляются не из шаблонов
+STATIC_PURGE_SAFELIST = [
+    'show',
+    'collapse',
+    'collapsing',
+]
+
+# caches
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Хранение сессий: cache - кэш с записью в БД (по умолчанию),
+# cookie - подписанные куки, db - только БД
+SESSION_ENGINES = {
+    'cache': 'core.sessions',
+    'cookie': 'django.contrib.sessions.backends.signed_cookies',
+    'db': 'django.contrib.sessions.backends.db',
+}
+SESSION_ENGINE = SESSION_ENGINES[os.environ.get('SESSION_MODE', 'cache')]
+
+# Ограничение частоты запросов по группам вью, см. core.ratelimit
+RATELIMITS = {
+    'post_create': '10/m',
+    'add_comment': '30/m',
+    'follow': '60/m',
+    'feed_since': '60/m',
+    'comment_stream': '30/m',
+}
+# Сколько потоков и long polling один клиент держит одновременно
+STREAMS_PER_CLIENT = 4
+# Открывать поток новых комментариев на каждой странице поста. Поток
+# держит соединение минутами: включать, только если приложение
+# обслуживает асинхронный сервер, а не синхронные воркеры WSGI
+LIVE_STREAMS = os.environ.get('LIVE_STREAMS', '') == '1'
+
+# 403 error
+CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
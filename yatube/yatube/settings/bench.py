@@ -0,0 +1,14 @@
+"""Настройки для нагрузочных замеров: минимум приложений и проверок."""
+from .base import *  # noqa: F401,F403
+from .base import CORE_APPS
+
+DEBUG = False
+
+ALLOWED_HOSTS = ['*']
+
+INSTALLED_APPS = CORE_APPS
+
+# Быстрый хешер, чтобы создание пользователей не искажало замеры
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.MD5PasswordHasher',
+]
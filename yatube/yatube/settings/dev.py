@@ -0,0 +1,8 @@
+"""Настройки для локальной разработки и тестов."""
+from .base import *  # noqa: F401,F403
+from .base import CORE_APPS, OPTIONAL_APPS
+
+DEBUG = True
+
+# В разработке подключаем все необязательные приложения, включая админку
+INSTALLED_APPS = OPTIONAL_APPS + CORE_APPS
@@ -0,0 +1,45 @@
+"""Боевые настройки: всё секретное берётся из окружения."""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .base import *  # noqa: F401,F403
+
+SECRET_KEY = os.environ['SECRET_KEY']
+
+DEBUG = False
+
+ALLOWED_HOSTS = [
+    host for host in os.environ.get('ALLOWED_HOSTS', '').split(',') if host
+]
+
+OUTBOX_EMAIL_BACKEND = os.environ.get(
+    'EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend'
+)
+
+STATICFILES_STORAGE = 'core.storage.CompressedManifestStaticFilesStorage'
+
+# Кэш общий для всех воркеров: в нём сбрасываются пользователь сессии
+# (core.auth), авторы, лимиты запросов и версии страниц. Кэш в памяти
+# процесса здесь не подходит - сброс увидел бы только один воркер.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.memcached.MemcachedCache',
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+PER_PROCESS_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+if (
+    CACHES['default']['BACKEND'] in PER_PROCESS_CACHES
+    or not CACHES['default']['LOCATION']
+):
+    raise ImproperlyConfigured(
+        'Нужен общий для воркеров кэш: задайте CACHE_LOCATION '
+        '(и CACHE_BACKEND, если это не memcached)'
+    )
@@ -1,7 +1,9 @@
-from django.contrib import admin
+from django.apps import apps
 from django.conf import settings
 from django.conf.urls.static import static
-from django.urls import include, path
+from django.urls import include, path, re_path
+
+from core.serve import serve
 
 handler404 = 'core.views.page_not_found'
 handler403 = 'core.views.permission_denied'
@@ -11,13 +13,30 @@ handler500 = 'core.views.server_error'
 
 urlpatterns = [
     path('', include('posts.urls', namespace='posts')),
-    path('admin/', admin.site.urls),
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
 ]
 
-if settings.DEBUG:
+if apps.is_installed('django.contrib.admin'):
+    from django.contrib import admin
+
+    urlpatterns.append(path('admin/', admin.site.urls))
+
+if settings.SERVE_STATIC:
+    urlpatterns += [
+        re_path(
+            r'^{}(?P<path>.*)$'.format(settings.STATIC_URL.lstrip('/')),
+            serve,
+            {'document_root': settings.STATIC_ROOT},
+        ),
+        re_path(
+            r'^{}(?P<path>.*)$'.format(settings.MEDIA_URL.lstrip('/')),
+            serve,
+            {'document_root': settings.MEDIA_ROOT, 'immutable': True},
+        ),
+    ]
+elif settings.DEBUG:
     urlpatterns += static(
         settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
     )
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+# просмотры из буфера воркера пишутся в БД и без новых запросов
+from posts.counters import start_flusher  # noqa: E402
+
+start_flusher()